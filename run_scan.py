@@ -0,0 +1,4 @@
+from src.common.library import main
+
+if __name__ == "__main__":
+    main()
@@ -2,21 +2,45 @@ import os
 import sys
 import argparse
 import time
+from concurrent.futures import ThreadPoolExecutor
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from webdriver_manager.chrome import ChromeDriverManager
 
+from src.common.audio import AUDIO_EXTENSIONS
+from src.common.throttle import format_limiter_stats
+
 # 从 finder 模块导入
 from src.applemusic.finder import (
     get_audio_metadata_full,
     search_apple_music,
     scrape_web_details_selenium,
+    build_remote_meta,
     merge_metadata,
     write_tags,
     display_diff
 )
 
+# process_file 的处理结果
+STATUS_OK = 'ok'            # 已写入标签
+STATUS_SKIPPED = 'skipped'  # 无结果、用户跳过或不在当前专辑中，未修改文件
+STATUS_FAILED = 'failed'    # 搜索/抓取/写入出错，可重试
+
+# 预取搜索结果的线程数；实际并发由 throttle 的自适应上限控制
+PREFETCH_WORKERS = 8
+
+def ask_choice(prompt, interactive=True):
+    """
+    读取用户选择。空输入视为默认值 '1'。
+    非交互模式 (如 watch 守护进程) 下直接返回默认值。
+    """
+    if not interactive:
+        return "1"
+    choice = input(prompt)
+    if choice.strip() == "": choice = "1"
+    return choice
+
 def init_driver():
     """初始化共享的 Selenium 驱动。"""
     chrome_options = Options()
@@ -34,25 +58,56 @@ def init_driver():
         print(f"初始化 Selenium 驱动失败: {e}")
         return None
 
-def process_file(file_path, driver, current_collection_id):
+def driver_alive(driver):
+    """探测浏览器驱动是否仍可用 (Chrome 崩溃后任何命令都会抛出异常)。"""
+    try:
+        driver.title
+        return True
+    except Exception:
+        return False
+
+def read_and_search(file_path, session=None):
+    """读取本地元数据并搜索，返回 (local_meta, results)；读取失败时为 (None, None)。"""
+    local_meta = get_audio_metadata_full(file_path)
+    if not local_meta:
+        return None, None
+    return local_meta, search_apple_music(local_meta, session=session)
+
+def prefetch_searches(executor, file_paths, session=None):
+    """
+    提交一组文件的搜索，返回 {文件路径: Future}。
+    搜索之间互不依赖，并发发出可让限流控制器的并发上限真正生效；
+    抓取与写入仍按顺序进行 (浏览器驱动不是线程安全的)。
+    """
+    return {path: executor.submit(read_and_search, path, session) for path in file_paths}
+
+def process_file(file_path, driver, current_collection_id, interactive=True, session=None, prefetched=None):
     """
     处理单个文件。
-    返回: 选中曲目的 collectionId (如果有)，否则返回 None。
+    interactive=False 时不读取标准输入：选择均取默认项，
+    且已确定专辑后不会回退到其它专辑的结果 (直接跳过)，避免写入错误专辑的元数据。
+    prefetched: prefetch_searches 返回的 Future，给出时直接使用其搜索结果。
+    返回: (状态, 选中曲目的 collectionId)，状态为 STATUS_OK / STATUS_SKIPPED / STATUS_FAILED。
     """
     print(f"\n正在处理: {os.path.basename(file_path)}")
     
-    # 1. 读取本地元数据
-    local_meta = get_audio_metadata_full(file_path)
+    # 1. 读取本地元数据 + 2. 搜索
+    if prefetched is not None:
+        local_meta, results = prefetched.result()
+    else:
+        local_meta = get_audio_metadata_full(file_path)
+        if local_meta:
+            print(f"正在搜索: {local_meta['title']} {local_meta['artist']} ...")
+            results = search_apple_music(local_meta, session=session)
     if not local_meta:
-        return None
-
-    # 2. 搜索
-    print(f"正在搜索: {local_meta['title']} {local_meta['artist']} ...")
-    results = search_apple_music(local_meta)
+        return STATUS_FAILED, None
     
+    if results is None:
+        print("搜索失败 (已重试)，跳过。")
+        return STATUS_FAILED, None
     if not results:
         print("未找到结果。")
-        return None
+        return STATUS_SKIPPED, None
 
     selected = None
     
@@ -69,57 +124,50 @@ def process_file(file_path, driver, current_collection_id):
             for i, item in enumerate(matches, 1):
                 print(f"[{i}] {item.get('trackName')} - {item.get('artistName')}")
             
-            choice = input(f"请选择 (1-{len(matches)}) 或输入 0 跳过 [默认 1]: ")
-            if choice.strip() == "": choice = "1"
+            choice = ask_choice(f"请选择 (1-{len(matches)}) 或输入 0 跳过 [默认 1]: ", interactive)
             if choice.isdigit() and int(choice) > 0 and int(choice) <= len(matches):
                 selected = matches[int(choice) - 1]
             else:
                 print("已跳过。")
-                return None
+                return STATUS_SKIPPED, None
+        elif not interactive:
+            print("当前专辑中未找到匹配项，已跳过。")
+            return STATUS_SKIPPED, None
         else:
             print("当前专辑中未找到匹配项。显示所有结果:")
             # 回退到显示所有结果
             for i, item in enumerate(results, 1):
                 print(f"[{i}] {item.get('trackName')} - {item.get('artistName')} ({item.get('collectionName')})")
             
-            choice = input(f"请选择 (1-{len(results)}) 或输入 0 跳过 [默认 1]: ")
-            if choice.strip() == "": choice = "1"
+            choice = ask_choice(f"请选择 (1-{len(results)}) 或输入 0 跳过 [默认 1]: ", interactive)
             if choice.isdigit() and int(choice) > 0 and int(choice) <= len(results):
                 selected = results[int(choice) - 1]
             else:
-                return None
+                return STATUS_SKIPPED, None
     else:
         # 第一个文件 (或尚未设置专辑)
         print("请选择正确的歌曲/专辑:")
         for i, item in enumerate(results, 1):
             print(f"[{i}] {item.get('trackName')} - {item.get('artistName')} ({item.get('collectionName')})")
         
-        choice = input(f"请选择 (1-{len(results)}) 或输入 0 跳过 [默认 1]: ")
-        if choice.strip() == "": choice = "1"
+        choice = ask_choice(f"请选择 (1-{len(results)}) 或输入 0 跳过 [默认 1]: ", interactive)
         if choice.isdigit() and int(choice) > 0 and int(choice) <= len(results):
             selected = results[int(choice) - 1]
         else:
-            return None
+            return STATUS_SKIPPED, None
 
     if not selected:
-        return None
+        return STATUS_SKIPPED, None
 
     # 4. 抓取详情
     track_url = selected.get('trackViewUrl')
     web_details = scrape_web_details_selenium(track_url, driver=driver)
+    if web_details['error']:
+        print("抓取详情失败，未写入。")
+        return STATUS_FAILED, selected.get('collectionId')
     
     # 5. 准备远程元数据
-    composer_str = "/".join(web_details['composers']) if web_details['composers'] else ""
-    lyricist_str = "/".join(web_details['lyricists']) if web_details['lyricists'] else ""
-    
-    remote_meta = {
-        'title': selected.get('trackName'),
-        'artist': selected.get('artistName'),
-        'album': selected.get('collectionName'),
-        'composer': composer_str,
-        'lyricist': lyricist_str,
-        'copyright': web_details['copyright']
-    }
+    remote_meta = build_remote_meta(selected, web_details)
 
     # 6. 合并
     final_meta = merge_metadata(local_meta, remote_meta)
@@ -128,54 +176,107 @@ def process_file(file_path, driver, current_collection_id):
     print("正在写入元数据...")
     if write_tags(file_path, final_meta):
         print("成功。")
-    else:
-        print("失败。")
-        
-    return selected.get('collectionId')
+        return STATUS_OK, selected.get('collectionId')
+    print("失败。")
+    return STATUS_FAILED, selected.get('collectionId')
+
+def process_files(file_paths, driver, interactive=True, session=None, collection_id=None):
+    """
+    按顺序处理同一专辑的一组文件。
+    第一个成功匹配的文件决定专辑 (collectionId)，后续文件在该专辑内匹配。
+    collection_id: 该目录此前已确定的专辑 (如监听模式中重试的文件或后到的文件)，
+    给出时所有文件都只在该专辑内匹配。
+    返回: (最终确定的 collectionId (可能为 None), {文件路径: 状态})。
+    """
+    current_collection_id = collection_id
+    statuses = {}
+    if current_collection_id:
+        print(f">>> 沿用已确定的专辑 ID: {current_collection_id}")
+
+    # 先并发发出整张专辑的搜索，后续按顺序逐个匹配、抓取与写入
+    print(f"正在并发搜索 {len(file_paths)} 个文件...")
+    executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+    try:
+        futures = prefetch_searches(executor, file_paths, session=session)
+
+        for i, file_path in enumerate(file_paths):
+            print(f"\n[{i+1}/{len(file_paths)}] 正在处理 {os.path.basename(file_path)}...")
+
+            # 如果尚未设置专辑，此文件将决定专辑。
+            # 如果已设置，我们尝试匹配它。
+
+            status, result_collection_id = process_file(file_path, driver, current_collection_id,
+                                                        interactive=interactive, session=session,
+                                                        prefetched=futures[file_path])
+            statuses[file_path] = status
+
+            if status == STATUS_OK and current_collection_id is None:
+                current_collection_id = result_collection_id
+                print(f"\n>>> 专辑 ID 已设置为: {current_collection_id}")
+    finally:
+        # 中断时取消尚未开始的搜索
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return current_collection_id, statuses
+
+def read_file_list(list_path):
+    """
+    读取文件列表 (每行一个路径)，按所在目录分组，返回 [(目录, [文件...]), ...]。
+    注意不支持从标准输入读取，因为后续的交互选择需要使用标准输入。
+    """
+    with open(list_path, encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    groups = {}
+    for line in lines:
+        path = line.strip()
+        if path and path.lower().endswith(AUDIO_EXTENSIONS) and os.path.exists(path):
+            groups.setdefault(os.path.dirname(path), []).append(path)
+    return [(folder, sorted(paths)) for folder, paths in sorted(groups.items())]
 
 def main():
     parser = argparse.ArgumentParser(description="Apple Music 批量标签工具")
-    parser.add_argument("folder_path", help="包含音频文件的文件夹")
+    parser.add_argument("folder_path", nargs="?", help="包含音频文件的文件夹")
+    parser.add_argument("--files-from", metavar="LIST",
+                        help="从文件读取待处理路径 (每行一个)，如 run_scan.py query 的输出")
     args = parser.parse_args()
-    
-    folder = args.folder_path.strip().strip("'").strip('"')
-    if not os.path.exists(folder):
-        print("文件夹未找到。")
-        return
 
-    files = [f for f in os.listdir(folder) if f.lower().endswith(('.mp3', '.flac', '.m4a', '.mp4'))]
-    files.sort()
-    
-    if not files:
+    if args.files_from:
+        albums = read_file_list(args.files_from)
+    else:
+        if not args.folder_path:
+            parser.error("需要提供文件夹路径或 --files-from")
+        folder = args.folder_path.strip().strip("'").strip('"')
+        if not os.path.exists(folder):
+            print("文件夹未找到。")
+            return
+
+        files = [f for f in os.listdir(folder) if f.lower().endswith(AUDIO_EXTENSIONS)]
+        files.sort()
+        albums = [(folder, [os.path.join(folder, f) for f in files])] if files else []
+
+    if not albums:
         print("未找到支持的音频文件。")
         return
-        
-    print(f"找到 {len(files)} 个文件。正在初始化 Selenium...")
+
+    total = sum(len(paths) for _, paths in albums)
+    print(f"找到 {total} 个文件 ({len(albums)} 个目录)。正在初始化 Selenium...")
     driver = init_driver()
     if not driver:
         return
 
-    current_collection_id = None
-    
     try:
-        for i, filename in enumerate(files):
-            file_path = os.path.join(folder, filename)
-            print(f"\n[{i+1}/{len(files)}] 正在处理 {filename}...")
-            
-            # 如果尚未设置专辑，此文件将决定专辑。
-            # 如果已设置，我们尝试匹配它。
-            
-            result_collection_id = process_file(file_path, driver, current_collection_id)
-            
-            if result_collection_id and current_collection_id is None:
-                current_collection_id = result_collection_id
-                print(f"\n>>> 专辑 ID 已设置为: {current_collection_id}")
-                
+        for folder, paths in albums:
+            if len(albums) > 1:
+                print(f"\n>>> 专辑目录: {folder}")
+            process_files(paths, driver)
     except KeyboardInterrupt:
         print("\n批量处理已中断。")
     finally:
         print("正在关闭驱动...")
         driver.quit()
+        if format_limiter_stats():
+            print(f"[限流统计] {format_limiter_stats()}")
 
 if __name__ == "__main__":
     main()
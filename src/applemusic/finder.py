@@ -2,15 +2,22 @@ import os
 import re
 import sys
 import argparse
-import requests
 import mutagen
 from mutagen.easyid3 import EasyID3
-from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCOM, TCOP, TEXT, ID3NoHeaderError
+from mutagen.id3 import (
+    ID3, TIT2, TPE1, TPE2, TALB, TCOM, TCOP, TEXT, TRCK, TPOS, TDRC, TCON, TXXX, UFID,
+    ID3NoHeaderError
+)
 from mutagen.flac import FLAC
 from mutagen.mp4 import MP4
 from bs4 import BeautifulSoup
 from urllib.parse import urlparse, parse_qs, urlunparse
 
+from src.common import throttle
+import src.common.audio  # noqa: F401  注册 EasyMP4 的 composer / lyricist 键 (回退读取时使用)
+from src.common.fastread import read_tags_fast
+from src.common.provider import MetadataProvider
+
 # --- Selenium 依赖 ---
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
@@ -52,10 +59,15 @@ def get_audio_metadata_full(file_path):
     }
 
     try:
-        # 使用 easy=True 接口读取通用标签
-        audio = mutagen.File(file_path, easy=True)
+        # 优先使用轻量读取器 (只读标签区域，跳过封面)，不支持的格式/结构返回 None
+        fast = read_tags_fast(file_path)
+        # 否则使用 easy=True 接口读取通用标签
+        audio = mutagen.File(file_path, easy=True) if fast is None else None
         
-        if audio:
+        if fast is not None:
+            for key in meta:
+                meta[key] = fast[key]
+        elif audio:
             meta['title'] = audio.get('title', [''])[0]
             meta['artist'] = audio.get('artist', [''])[0]
             meta['album'] = audio.get('album', [''])[0]
@@ -75,21 +87,28 @@ def get_audio_metadata_full(file_path):
         # 出错时返回基础字典，避免程序崩溃
         return meta
 
-def search_apple_music(query_meta):
+def search_apple_music(query_meta, session=None):
+    """
+    调用 iTunes Search API 搜索歌曲。
+    传入 session (requests.Session) 时复用其连接池，适合批量/常驻进程。
+    请求经过共享的自适应限流控制器，被限流时会退避重试。
+    返回结果列表；重试后仍失败时返回 None (与"没有结果"的空列表区分)。
+    """
     base_url = "https://itunes.apple.com/search"
     search_term = f"{query_meta['title']} {query_meta['artist']}"
     # 优先搜索香港区 (HK) 以获得中文支持
     params = {"term": search_term, "media": "music", "entity": "song", "limit": 5, "country": "HK"}
     try:
-        res = requests.get(base_url, params=params, timeout=10)
+        res = throttle.request("GET", base_url, session=session, params=params, timeout=10)
         res.raise_for_status()
         return res.json().get('results', [])
     except Exception as e:
         print(f"搜索出错: {e}")
-        return []
+        return None
 
 def scrape_web_details_selenium(track_url, driver=None):
-    details = {'composers': [], 'lyricists': [], 'copyright': '', 'label': ''}
+    # error 非空表示抓取失败 (浏览器初始化失败或页面加载出错)，此时其余字段不可信
+    details = {'composers': [], 'lyricists': [], 'copyright': '', 'label': '', 'error': ''}
     target_url = convert_to_song_url(track_url)
     print(f"   -> 正在分析页面详情: {target_url}")
     
@@ -108,6 +127,7 @@ def scrape_web_details_selenium(track_url, driver=None):
             driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
         except Exception as e:
             print(f"初始化 Selenium 失败: {e}")
+            details['error'] = str(e)
             return details
 
     try:
@@ -139,26 +159,91 @@ def scrape_web_details_selenium(track_url, driver=None):
             
     except Exception as e:
         print(f"Selenium 抓取警告: {e}")
+        details['error'] = str(e)
     finally:
         if should_quit_driver and driver:
             driver.quit()
     return details
 
+def build_remote_meta(selected, web_details):
+    """根据搜索结果与页面详情构建远程元数据对象 (Remote)。"""
+    composer_str = "/".join(web_details['composers']) if web_details['composers'] else ""
+    lyricist_str = "/".join(web_details['lyricists']) if web_details['lyricists'] else ""
+
+    return {
+        'title': selected.get('trackName'),
+        'artist': selected.get('artistName'),
+        'album': selected.get('collectionName'),
+        'composer': composer_str,
+        'lyricist': lyricist_str,
+        'copyright': web_details['copyright']
+    }
+
+class AppleMusicProvider(MetadataProvider):
+    """
+    Apple Music 元数据来源：搜索后取第一项，再抓取页面获取作曲/作词/版权。
+    传入 driver / session 时复用；未传入 driver 时每次抓取临时启动浏览器。
+    """
+    name = 'applemusic'
+
+    def __init__(self, driver=None, session=None):
+        self.driver = driver
+        self.session = session
+
+    def resolve(self, local_meta, pin=None):
+        """取搜索结果的第一项；pin 为 collectionId 时只接受该专辑内的结果。"""
+        results = search_apple_music(local_meta, session=self.session)
+        if results is None:
+            raise RuntimeError("Apple Music 搜索失败")
+        if pin:
+            results = [r for r in results if r.get('collectionId') == pin]
+        if not results:
+            return {}
+        selected = results[0]
+        web_details = scrape_web_details_selenium(selected.get('trackViewUrl'), driver=self.driver)
+        if web_details['error']:
+            raise RuntimeError(f"Apple Music 抓取失败: {web_details['error']}")
+        remote = build_remote_meta(selected, web_details)
+        remote['album_id'] = selected.get('collectionId')
+        return remote
+
+    def close(self):
+        if self.driver:
+            self.driver.quit()
+            self.driver = None
+        if self.session:
+            self.session.close()
+            self.session = None
+
 # ================= 核心逻辑: 数据合并与写入 =================
 
-def merge_metadata(local, remote):
+# 默认参与合并/展示的字段
+META_KEYS = ['title', 'artist', 'album', 'composer', 'lyricist', 'copyright']
+
+def merge_metadata(local, remote, keys=None, priority=None):
     """
     策略：
     1. 如果 Remote 有值，优先使用 Remote (更新)。
     2. 如果 Remote 为空，但 Local 有值，保留 Local (不覆盖为空)。
     3. 只有当 Remote 和 Local 都为空时，结果才为空。
+
+    多来源合并时，remote 为 {来源名称: 远程字典}，并通过 priority
+    ({字段: [来源名称, ...]}) 指定每个字段的来源优先顺序；
+    未配置的字段按 remote 中的来源顺序取第一个非空值。
     """
     final = {}
-    keys = ['title', 'artist', 'album', 'composer', 'lyricist', 'copyright']
-    
+    keys = keys or META_KEYS
+
     for key in keys:
-        r_val = remote.get(key, '').strip()
-        l_val = local.get(key, '').strip()
+        if priority is None:
+            r_val = (remote.get(key) or '').strip()
+        else:
+            r_val = ''
+            for source in priority.get(key, list(remote)):
+                r_val = (remote.get(source, {}).get(key) or '').strip()
+                if r_val:
+                    break
+        l_val = (local.get(key) or '').strip()
         
         if r_val:
             final[key] = r_val
@@ -171,14 +256,13 @@ def merge_metadata(local, remote):
             
     return final
 
-def display_diff(local, final):
+def display_diff(local, final, keys=None):
     """展示变更对比"""
     print("\n" + "="*25 + " 修改预览 " + "="*25)
     print(f"{'字段':<12} | {'原值 (Local)':<25} | {'新值 (待写入)'}")
     print("-" * 80)
     
-    keys = ['title', 'artist', 'album', 'composer', 'lyricist', 'copyright']
-    for key in keys:
+    for key in keys or META_KEYS:
         old_val = local.get(key, '')
         new_val = final.get(key, '')
         
@@ -196,6 +280,43 @@ def display_diff(local, final):
     print(f"{'Cover':<12} | {'(Original)':<25} -> [保留原封面 (不做处理)]")
     print("="*80)
 
+# 可选写入字段 (多来源合并时提供)；Vorbis 注释直接使用同名键
+OPTIONAL_KEYS = [
+    'albumartist', 'date', 'tracknumber', 'discnumber', 'genre',
+    'musicbrainz_trackid', 'musicbrainz_artistid', 'musicbrainz_albumid',
+]
+
+# MusicBrainz ID 在 ID3 TXXX / MP4 自定义原子中的描述 (与 Picard 一致)
+ID3_TXXX_KEYS = {
+    'musicbrainz_artistid': 'MusicBrainz Artist Id',
+    'musicbrainz_albumid': 'MusicBrainz Album Id',
+}
+
+def _split_total(value):
+    """'3/12' -> ('3', '12')；没有总数时总数为空字符串。"""
+    number, _, total = str(value or '').partition('/')
+    return number.strip(), total.strip()
+
+def _keep_total(value, existing):
+    """
+    轨道/光盘编号：新值没有总数而文件原值有时，沿用原值的总数
+    (如来源只给出 '3'，文件原为 '3/12')，避免一次写入丢失总数。
+    """
+    number, total = _split_total(value)
+    if total or not number:
+        return value
+    _, old_total = _split_total(existing)
+    return f"{number}/{old_total}" if old_total else value
+
+def _mp4_pair(value, existing):
+    """trkn / disk 的 (编号, 总数)；编号非纯数字 (如黑胶的 'A1') 时返回 None。"""
+    number, total = _split_total(value)
+    if not number.isdigit():
+        return None
+    if total.isdigit():
+        return (int(number), int(total))
+    return (int(number), existing[0][1] if existing else 0)
+
 def write_tags(file_path, meta):
     """写入标签 (仅写入文本，不处理封面)"""
     ext = os.path.splitext(file_path)[1].lower()
@@ -215,6 +336,19 @@ def write_tags(file_path, meta):
             tags.add(TCOM(encoding=3, text=meta['composer'])) 
             tags.add(TEXT(encoding=3, text=meta['lyricist'])) 
             tags.add(TCOP(encoding=3, text=meta['copyright'])) 
+
+            # 可选字段 (多来源合并时提供)，仅在有值时写入
+            if meta.get('albumartist'): tags.add(TPE2(encoding=3, text=meta['albumartist']))
+            if meta.get('date'): tags.add(TDRC(encoding=3, text=meta['date']))
+            if meta.get('tracknumber'):
+                tags.add(TRCK(encoding=3, text=_keep_total(meta['tracknumber'], tags.get('TRCK'))))
+            if meta.get('discnumber'):
+                tags.add(TPOS(encoding=3, text=_keep_total(meta['discnumber'], tags.get('TPOS'))))
+            if meta.get('genre'): tags.add(TCON(encoding=3, text=meta['genre']))
+            if meta.get('musicbrainz_trackid'):
+                tags.add(UFID(owner='http://musicbrainz.org', data=meta['musicbrainz_trackid'].encode('ascii')))
+            for key, desc in ID3_TXXX_KEYS.items():
+                if meta.get(key): tags.add(TXXX(encoding=3, desc=desc, text=meta[key]))
             tags.save(file_path, v2_version=3)
 
         # === FLAC ===
@@ -226,6 +360,13 @@ def write_tags(file_path, meta):
             audio['composer'] = meta['composer']
             audio['lyricist'] = meta['lyricist']
             audio['copyright'] = meta['copyright']
+            for key in OPTIONAL_KEYS:
+                if not meta.get(key):
+                    continue
+                if key in ('tracknumber', 'discnumber'):
+                    audio[key] = _keep_total(meta[key], audio.get(key, [''])[0])
+                else:
+                    audio[key] = meta[key]
             audio.save()
 
         # === M4A/MP4 ===
@@ -245,6 +386,19 @@ def write_tags(file_path, meta):
                 except Exception as e:
                     print(f" (M4A作词人写入警告: {e})", end="")
 
+            if meta.get('albumartist'): audio['aART'] = meta['albumartist']
+            if meta.get('date'): audio['\xa9day'] = meta['date']
+            if meta.get('genre'): audio['\xa9gen'] = meta['genre']
+            # trkn / disk 要求整数，非纯数字 (如黑胶的 'A1') 时跳过；没有总数时保留文件原有的总数
+            for key, atom in (('tracknumber', 'trkn'), ('discnumber', 'disk')):
+                pair = _mp4_pair(meta.get(key), audio.get(atom))
+                if pair:
+                    audio[atom] = [pair]
+            for key, desc in ID3_TXXX_KEYS.items():
+                if meta.get(key): audio[f'----:com.apple.iTunes:{desc}'] = [meta[key].encode('utf-8')]
+            if meta.get('musicbrainz_trackid'):
+                audio['----:com.apple.iTunes:MusicBrainz Track Id'] = [meta['musicbrainz_trackid'].encode('utf-8')]
+
             audio.save()
 
         else:
@@ -272,6 +426,9 @@ def main():
     print(f"正在搜索: {local_meta['title']} {local_meta['artist']} ...")
     results = search_apple_music(local_meta)
     
+    if results is None:
+        print("Apple Music 搜索失败。将不进行任何修改。")
+        return
     if not results:
         print("未在 Apple Music 找到相关结果。将不进行任何修改。")
         return
@@ -292,17 +449,7 @@ def main():
     web_details = scrape_web_details_selenium(track_url)
     
     # 5. 构建远程数据对象 (Remote)
-    composer_str = "/".join(web_details['composers']) if web_details['composers'] else ""
-    lyricist_str = "/".join(web_details['lyricists']) if web_details['lyricists'] else ""
-    
-    remote_meta = {
-        'title': selected.get('trackName'),
-        'artist': selected.get('artistName'),
-        'album': selected.get('collectionName'),
-        'composer': composer_str,
-        'lyricist': lyricist_str,
-        'copyright': web_details['copyright']
-    }
+    remote_meta = build_remote_meta(selected, web_details)
 
     # 6. 数据合并 (关键逻辑：Remote 为空时保留 Local)
     final_meta = merge_metadata(local_meta, remote_meta)
@@ -0,0 +1,448 @@
+import os
+import sys
+import time
+import queue
+import select
+import signal
+import struct
+import ctypes
+import ctypes.util
+import argparse
+import threading
+import requests
+
+from src.common.audio import AUDIO_EXTENSIONS
+from src.common.throttle import format_limiter_stats
+from src.applemusic.batch import (
+    STATUS_OK, STATUS_SKIPPED, STATUS_FAILED, driver_alive, init_driver, process_files
+)
+
+# 处理失败的文件最多重新入队的次数
+MAX_ATTEMPTS = 3
+
+# ================= 文件系统监听 =================
+
+# inotify 事件掩码 (见 <sys/inotify.h>)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+def is_audio_file(path):
+    return path.lower().endswith(AUDIO_EXTENSIONS)
+
+def iter_audio_files(root):
+    """递归列出目录下所有支持的音频文件。"""
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if is_audio_file(name):
+                yield os.path.join(dirpath, name)
+
+class InotifyWatcher:
+    """
+    基于 Linux inotify 的递归目录监听 (通过 ctypes 调用 libc，无额外依赖)。
+    poll() 返回自上次调用以来发生变化的音频文件路径。
+    """
+    def __init__(self, root):
+        self.root = root
+        self.wd_to_dir = {}
+        libc_name = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not libc_name:
+            raise OSError("当前平台不支持 inotify")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._rescan = False
+        self._add_tree(root)
+
+    def _add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            print(f"无法监听目录 {path}: {os.strerror(ctypes.get_errno())}")
+            return
+        self.wd_to_dir[wd] = path
+
+    def _add_tree(self, root):
+        for dirpath, _, _ in os.walk(root):
+            self._add_watch(dirpath)
+
+    def poll(self, timeout):
+        changed = set()
+        if self._rescan:
+            # 事件队列溢出后无法得知丢失了哪些事件，全量上报一次
+            self._rescan = False
+            changed.update(iter_audio_files(self.root))
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                self._rescan = True
+                continue
+
+            parent = self.wd_to_dir.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+
+            if mask & IN_ISDIR:
+                # 新建或移入的子目录：补充监听，并上报其中已存在的文件
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)
+                    changed.update(iter_audio_files(path))
+            elif is_audio_file(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    轮询回退方案：定期遍历目录，比较 (size, mtime) 快照。
+    """
+    def __init__(self, root, interval=2.0):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _take_snapshot(self):
+        snapshot = {}
+        for path in iter_audio_files(self.root):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snapshot[path] = (st.st_size, st.st_mtime)
+        return snapshot
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        current = self._take_snapshot()
+        changed = {p for p, sig in current.items() if self.snapshot.get(p) != sig}
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+def create_watcher(root, force_polling=False, poll_interval=2.0):
+    """优先使用 inotify，不可用时回退到轮询。"""
+    if not force_polling:
+        try:
+            watcher = InotifyWatcher(root)
+            print("监听方式: inotify")
+            return watcher
+        except (OSError, AttributeError) as e:
+            print(f"inotify 不可用 ({e})，回退到轮询模式。")
+    print(f"监听方式: 轮询 (间隔 {poll_interval}s)")
+    return PollingWatcher(root, interval=poll_interval)
+
+# ================= 防抖与专辑分组 =================
+
+class AlbumCollector:
+    """
+    收集变化的文件，等待其写入稳定 (size/mtime 在 settle 秒内不再变化)，
+    并按所在目录 (即专辑) 分组。一个目录中的所有文件均稳定、
+    且该目录在 settle 秒内没有新文件到达时，整个专辑才会被放出。
+    """
+    def __init__(self, settle=5.0):
+        self.settle = settle
+        # path -> (size, mtime, 最近一次变化的时间)
+        self.pending = {}
+        # 已入队/处理中的文件，写入标签时产生的事件需忽略
+        self.in_flight = set()
+        # path -> 处理完成后的 (size, mtime)，用于忽略我们自己写入标签引起的事件
+        self.done = {}
+        # path -> 已失败次数
+        self.attempts = {}
+
+    def touch(self, path, now):
+        if path in self.in_flight:
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            # 文件已被删除或移走
+            self.pending.pop(path, None)
+            return
+        sig = (st.st_size, st.st_mtime)
+        if self.done.get(path) == sig:
+            return
+        old = self.pending.get(path)
+        if old is None or old[:2] != sig:
+            self.pending[path] = (sig[0], sig[1], now)
+
+    def refresh(self, now):
+        """重新检查待定文件 (轮询补偿：有些拷贝工具不会触发 close_write)。"""
+        for path in list(self.pending):
+            self.touch(path, now)
+
+    def pop_ready_albums(self, now):
+        by_dir = {}
+        for path, (_, _, changed_at) in self.pending.items():
+            by_dir.setdefault(os.path.dirname(path), []).append(changed_at)
+
+        ready = []
+        for folder, stamps in by_dir.items():
+            if now - max(stamps) >= self.settle:
+                files = sorted(p for p in self.pending if os.path.dirname(p) == folder)
+                ready.append((folder, files))
+        return ready
+
+    def release(self, files):
+        """专辑已入队：从待定列表移到处理中。"""
+        for path in files:
+            self.pending.pop(path, None)
+            self.in_flight.add(path)
+
+    def retry(self, path, now, max_attempts=MAX_ATTEMPTS):
+        """
+        处理失败：放回待定列表，等待 settle 秒后随下一批重新入队。
+        超过重试次数时返回 False，由调用方放弃该文件。
+        """
+        self.attempts[path] = self.attempts.get(path, 0) + 1
+        if self.attempts[path] >= max_attempts:
+            return False
+        self.in_flight.discard(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return True  # 文件已被移走，无需再处理
+        self.pending[path] = (st.st_size, st.st_mtime, now)
+        return True
+
+    def mark_done(self, path):
+        self.in_flight.discard(path)
+        self.attempts.pop(path, None)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self.done[path] = (st.st_size, st.st_mtime)
+
+# ================= 守护进程 =================
+
+class WatchDaemon:
+    """
+    常驻监听进程：主线程负责监听与防抖，工作线程持有预热的 WebDriver 与
+    HTTP Session，从有界队列中取出专辑依次处理。
+    """
+    def __init__(self, root, settle=5.0, queue_size=8, status_interval=60.0,
+                 force_polling=False, poll_interval=2.0, process_existing=False):
+        self.root = root
+        self.status_interval = status_interval
+        self.collector = AlbumCollector(settle=settle)
+        self.watcher = create_watcher(root, force_polling=force_polling, poll_interval=poll_interval)
+        self.work_queue = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        # 目录 -> 已确定的 collectionId (仅工作线程访问)。
+        # 重试的文件或后到的文件单独处理时沿用该专辑，而不是取全局搜索的第一个结果
+        self.album_ids = {}
+        self.stats = {
+            'started': time.time(),
+            'albums_done': 0,
+            'files_done': 0,
+            'files_skipped': 0,
+            'files_retried': 0,
+            'files_failed': 0,
+            'albums_failed': 0,
+            'driver_restarts': 0,
+            'last_latency': None,
+        }
+        if process_existing:
+            now = time.time()
+            for path in iter_audio_files(root):
+                self.collector.touch(path, now)
+
+    # --- 工作线程 ---
+
+    def _ensure_driver(self, driver):
+        """返回可用的驱动；驱动缺失或已崩溃时重建。"""
+        if driver is not None and driver_alive(driver):
+            return driver
+        if driver is not None:
+            print("浏览器驱动已失效，正在重建...")
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        with self.lock:
+            self.stats['driver_restarts'] += 1
+        return init_driver()
+
+    def _finish(self, files, statuses, ready_at):
+        """根据每个文件的处理结果更新统计：成功/跳过的文件标记完成，失败的文件重新入队。"""
+        now = time.time()
+        with self.lock:
+            for path in files:
+                status = statuses.get(path, STATUS_FAILED)
+                if status == STATUS_OK:
+                    self.stats['files_done'] += 1
+                    self.collector.mark_done(path)
+                elif status == STATUS_SKIPPED:
+                    self.stats['files_skipped'] += 1
+                    self.collector.mark_done(path)
+                elif self.collector.retry(path, now):
+                    self.stats['files_retried'] += 1
+                    print(f"处理失败，稍后重试: {path}")
+                else:
+                    self.stats['files_failed'] += 1
+                    self.collector.mark_done(path)
+                    print(f"处理失败 {MAX_ATTEMPTS} 次，已放弃: {path}")
+
+            if any(statuses.get(p, STATUS_FAILED) == STATUS_FAILED for p in files):
+                self.stats['albums_failed'] += 1
+            else:
+                self.stats['albums_done'] += 1
+            self.stats['last_latency'] = now - ready_at
+
+    def _worker(self):
+        session = requests.Session()
+        driver = init_driver()
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    folder, files, ready_at = self.work_queue.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+
+                print(f"\n>>> 开始处理专辑目录: {folder} ({len(files)} 个文件)")
+                statuses = {}
+                try:
+                    driver = self._ensure_driver(driver)
+                    if driver is None:
+                        print("Selenium 驱动不可用，本专辑稍后重试。")
+                    else:
+                        collection_id, statuses = process_files(
+                            files, driver, interactive=False, session=session,
+                            collection_id=self.album_ids.get(folder),
+                        )
+                        if collection_id:
+                            self.album_ids[folder] = collection_id
+                except Exception as e:
+                    print(f"处理专辑出错 {folder}: {e}")
+                finally:
+                    # 未返回状态的文件按失败处理
+                    self._finish(files, statuses, ready_at)
+                    self.work_queue.task_done()
+        finally:
+            session.close()
+            if driver:
+                print("正在关闭驱动...")
+                try:
+                    driver.quit()
+                except Exception:
+                    pass
+
+    # --- 状态输出 ---
+
+    def print_status(self):
+        with self.lock:
+            s = dict(self.stats)
+            pending = len(self.collector.pending)
+        uptime = int(time.time() - s['started'])
+        latency = f"{s['last_latency']:.1f}s" if s['last_latency'] is not None else "-"
+        print(f"[状态] 运行 {uptime}s | 待稳定文件 {pending} | 队列 {self.work_queue.qsize()}/{self.work_queue.maxsize} | "
+              f"已完成专辑 {s['albums_done']} | 有失败的专辑 {s['albums_failed']} | "
+              f"文件 成功 {s['files_done']} / 跳过 {s['files_skipped']} / 重试 {s['files_retried']} / 放弃 {s['files_failed']} | "
+              f"驱动重建 {s['driver_restarts']} | 最近延迟 {latency}")
+        limiter_stats = format_limiter_stats()
+        if limiter_stats:
+            print(f"[限流] {limiter_stats}")
+
+    # --- 主循环 ---
+
+    def stop(self, *_):
+        if not self.stop_event.is_set():
+            print("\n收到停止信号，处理完当前专辑后退出...")
+        self.stop_event.set()
+
+    def run(self):
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+
+        worker = threading.Thread(target=self._worker, name="tagger-worker")
+        worker.start()
+        print(f"正在监听: {self.root} (Ctrl+C 退出)")
+
+        last_status = time.time()
+        try:
+            while not self.stop_event.is_set():
+                changed = self.watcher.poll(timeout=1.0)
+                now = time.time()
+                with self.lock:
+                    self.collector.refresh(now)
+                    for path in changed:
+                        self.collector.touch(path, now)
+                    ready = self.collector.pop_ready_albums(now)
+
+                for folder, files in ready:
+                    try:
+                        self.work_queue.put_nowait((folder, files, now))
+                    except queue.Full:
+                        # 队列已满：保留在待定列表中，下一轮再尝试 (背压)
+                        break
+                    with self.lock:
+                        self.collector.release(files)
+
+                if self.status_interval and now - last_status >= self.status_interval:
+                    self.print_status()
+                    last_status = now
+        finally:
+            self.stop_event.set()
+            worker.join()
+            self.watcher.close()
+            self.print_status()
+
+def main():
+    parser = argparse.ArgumentParser(description="Apple Music 监听目录自动标签 (常驻进程)")
+    parser.add_argument("folder_path", help="要监听的落地目录")
+    parser.add_argument("--settle", type=float, default=5.0, help="文件稳定多少秒后视为拷贝完成 (默认 5)")
+    parser.add_argument("--queue-size", type=int, default=8, help="待处理专辑队列上限 (默认 8)")
+    parser.add_argument("--status-interval", type=float, default=60.0, help="状态输出间隔秒数，0 表示关闭 (默认 60)")
+    parser.add_argument("--poll", action="store_true", help="强制使用轮询而不是 inotify")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="轮询间隔秒数 (默认 2)")
+    parser.add_argument("--process-existing", action="store_true", help="启动时处理目录中已存在的文件")
+    args = parser.parse_args()
+
+    folder = args.folder_path.strip().strip("'").strip('"')
+    if not os.path.isdir(folder):
+        print("文件夹未找到。")
+        return
+
+    daemon = WatchDaemon(
+        folder,
+        settle=args.settle,
+        queue_size=args.queue_size,
+        status_interval=args.status_interval,
+        force_polling=args.poll,
+        poll_interval=args.poll_interval,
+        process_existing=args.process_existing,
+    )
+    daemon.run()
+
+if __name__ == "__main__":
+    main()
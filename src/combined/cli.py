@@ -0,0 +1,111 @@
+import os
+import argparse
+import requests
+
+from src.common.audio import AUDIO_EXTENSIONS, AudioFileHandler
+from src.musicbrainz.client import MusicBrainzClient
+from src.applemusic.finder import AppleMusicProvider, display_diff, write_tags
+from src.applemusic.batch import init_driver
+from src.combined.resolver import ALL_KEYS, CombinedResolver
+from src.common.throttle import format_limiter_stats
+
+def read_local_meta(file_path):
+    """读取本地标签；没有标题时回退到文件名。"""
+    try:
+        meta = AudioFileHandler(file_path).get_tags()
+    except Exception as e:
+        print(f"加载文件出错: {e}")
+        return None
+    if not meta.get('title'):
+        meta['title'] = os.path.splitext(os.path.basename(file_path))[0]
+    return meta
+
+def process_file(file_path, resolver, assume_yes=False, pins=None):
+    """
+    合并两个来源的结果并一次性写入。
+    pins: {来源名称: 专辑标识}，给出时各来源只接受该专辑内的结果。
+    返回各来源的结果字典；未写入时返回 None。
+    """
+    print(f"\n正在处理: {os.path.basename(file_path)}")
+    local_meta = read_local_meta(file_path)
+    if not local_meta:
+        return None
+
+    print(f"正在并发查询 MusicBrainz 与 Apple Music: {local_meta['title']} {local_meta['artist']} ...")
+    final_meta, results = resolver.resolve(local_meta, pins=pins)
+    if not any(results.values()):
+        print("两个来源均未找到结果。将不进行任何修改。")
+        return None
+
+    display_diff(local_meta, final_meta, keys=ALL_KEYS)
+
+    if not assume_yes:
+        confirm = input("\n是否根据'新值'更新文件标签? [y/N]: ").lower()
+        if confirm != 'y':
+            print("操作已取消。")
+            return None
+
+    print("正在写入元数据...", end="")
+    if write_tags(file_path, final_meta):
+        print(" [成功]")
+        return results
+    print(" [失败]")
+    return None
+
+def main():
+    parser = argparse.ArgumentParser(description="MusicBrainz + Apple Music 合并标签工具 (一次查询，一次写入)")
+    parser.add_argument("path", help="音频文件或文件夹路径")
+    parser.add_argument("-y", "--yes", action="store_true", help="不询问确认，直接写入")
+    parser.add_argument("--mb-db", metavar="DB", help="使用本地 MusicBrainz 镜像数据库代替在线 API")
+    args = parser.parse_args()
+
+    path = args.path.strip().strip("'").strip('"')
+    if os.path.isdir(path):
+        files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(AUDIO_EXTENSIONS))
+    elif os.path.exists(path):
+        files = [path]
+    else:
+        print(f"文件未找到: {path}")
+        return
+
+    if not files:
+        print("未找到支持的音频文件。")
+        return
+
+    # 先创建 MusicBrainz 来源：本地镜像路径无效时在启动浏览器之前报错退出
+    try:
+        mb_client = MusicBrainzClient(backend='local', db_path=args.mb_db) if args.mb_db else MusicBrainzClient()
+    except (OSError, ValueError) as e:
+        print(f"初始化 MusicBrainz 失败: {e}")
+        return
+
+    print(f"找到 {len(files)} 个文件。正在初始化 Selenium...")
+    driver = init_driver()
+    if not driver:
+        mb_client.close()
+        return
+
+    resolver = CombinedResolver([
+        mb_client,
+        AppleMusicProvider(driver=driver, session=requests.Session()),
+    ])
+    # 同一文件夹视为同一专辑：第一个成功写入的文件确定各来源的专辑，后续文件固定到该专辑
+    pins = {}
+    try:
+        for file_path in files:
+            results = process_file(file_path, resolver, assume_yes=args.yes, pins=pins)
+            if results and os.path.isdir(path):
+                for name, remote in results.items():
+                    if remote.get('album_id') and name not in pins:
+                        pins[name] = remote['album_id']
+                        print(f"已固定 {name} 专辑: {remote['album_id']}")
+    except KeyboardInterrupt:
+        print("\n处理已中断。")
+    finally:
+        print("正在关闭驱动...")
+        resolver.close()
+        if format_limiter_stats():
+            print(f"[限流统计] {format_limiter_stats()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.applemusic.finder import merge_metadata
+
+# 合并/写入的全部字段
+ALL_KEYS = [
+    'title', 'artist', 'album', 'albumartist', 'date',
+    'tracknumber', 'discnumber', 'genre',
+    'composer', 'lyricist', 'copyright',
+    'musicbrainz_trackid', 'musicbrainz_artistid', 'musicbrainz_albumid',
+]
+
+# 每个字段的来源优先顺序：
+# - MusicBrainz ID、轨道/光盘编号、日期、专辑艺术家以 MusicBrainz 为准
+# - 作曲、作词、版权只有 Apple Music 页面提供
+# - 标题/艺术家/专辑优先 Apple Music (香港区的中文名称)
+FIELD_PRIORITY = {
+    'title': ['applemusic', 'musicbrainz'],
+    'artist': ['applemusic', 'musicbrainz'],
+    'album': ['applemusic', 'musicbrainz'],
+    'albumartist': ['musicbrainz', 'applemusic'],
+    'date': ['musicbrainz', 'applemusic'],
+    'tracknumber': ['musicbrainz'],
+    'discnumber': ['musicbrainz'],
+    'genre': ['musicbrainz', 'applemusic'],
+    'composer': ['applemusic', 'musicbrainz'],
+    'lyricist': ['applemusic', 'musicbrainz'],
+    'copyright': ['applemusic', 'musicbrainz'],
+    'musicbrainz_trackid': ['musicbrainz'],
+    'musicbrainz_artistid': ['musicbrainz'],
+    'musicbrainz_albumid': ['musicbrainz'],
+}
+
+class CombinedResolver:
+    """
+    并发查询多个元数据来源，并按字段优先级合并为一份最终标签。
+    每个来源同一时间只处理一个请求 (浏览器驱动不是线程安全的)。
+    """
+    def __init__(self, providers, priority=None):
+        self.providers = providers
+        self.priority = priority or FIELD_PRIORITY
+        self.executor = ThreadPoolExecutor(max_workers=len(providers))
+
+    def query(self, local_meta, pins=None):
+        """
+        并发调用所有来源，返回 {来源名称: 远程字典}。单个来源出错不影响其它来源。
+        pins: {来源名称: 专辑标识}，用于把同一文件夹内的后续文件固定到同一专辑。
+        """
+        pins = pins or {}
+        futures = {
+            p.name: self.executor.submit(p.resolve, local_meta, pins.get(p.name))
+            for p in self.providers
+        }
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result() or {}
+            except Exception as e:
+                print(f"来源 {name} 查询出错: {e}")
+                results[name] = {}
+        return results
+
+    def resolve(self, local_meta, pins=None):
+        """
+        返回 (final_meta, results)。
+        final_meta 为按优先级合并、并保留本地非空值后的完整标签。
+        MusicBrainz 结果与 Apple Music 及本地标签的专辑/艺术家都不一致时会被丢弃，
+        以免把另一张专辑的 MusicBrainz ID 与编号混入。
+        """
+        results = self.query(local_meta, pins)
+        mb, apple = results.get('musicbrainz'), results.get('applemusic')
+        if mb and apple:
+            for key in ('album', 'artist'):
+                local_value = local_meta.get(key)
+                if not (_similar(mb.get(key), apple.get(key))
+                        or (_normalize(local_value) and _similar(mb.get(key), local_value))):
+                    print(f"[警告] MusicBrainz 与 Apple Music 的{'专辑' if key == 'album' else '艺术家'}不一致: "
+                          f"'{mb.get(key)}' / '{apple.get(key)}'，已忽略 MusicBrainz 结果。")
+                    results['musicbrainz'] = {}
+                    break
+        final = merge_metadata(local_meta, results, keys=ALL_KEYS, priority=self.priority)
+        return final, results
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for provider in self.providers:
+            provider.close()
+
+def _normalize(value):
+    """比较用的规范化：忽略大小写、空白与标点。"""
+    return ''.join(ch for ch in str(value or '').casefold() if ch.isalnum())
+
+def _similar(a, b):
+    """
+    判断两个名称是否指向同一对象。
+    任一为空时视为一致；一方包含另一方也视为一致 (如 Apple 的 "xxx - Single")。
+    """
+    a, b = _normalize(a), _normalize(b)
+    if not a or not b:
+        return True
+    return a in b or b in a
@@ -4,6 +4,15 @@ from mutagen.easyid3 import EasyID3
 from mutagen.mp3 import MP3
 from mutagen.flac import FLAC
 from mutagen.oggvorbis import OggVorbis
+from mutagen.easymp4 import EasyMP4Tags
+
+# 批量/监听/扫描模式支持的音频扩展名
+AUDIO_EXTENSIONS = ('.mp3', '.flac', '.m4a', '.mp4')
+
+# EasyMP4 默认没有 composer / lyricist 键。注册为 write_tags 写入 M4A 时使用的原子
+# (©wrt 与 ----:com.apple.iTunes:LYRICIST)，使 easy 接口能读到这两个字段。
+EasyMP4Tags.RegisterTextKey('composer', '\xa9wrt')
+EasyMP4Tags.RegisterFreeformKey('lyricist', 'LYRICIST')
 
 class AudioFileHandler:
     def __init__(self, filepath):
@@ -50,6 +59,9 @@ class AudioFileHandler:
             'albumartist': get_first('albumartist'),
             'discnumber': get_first('discnumber'),
             'genre': get_first('genre'),
+            'composer': get_first('composer'),
+            'lyricist': get_first('lyricist'),
+            'copyright': get_first('copyright'),
             'musicbrainz_trackid': get_first('musicbrainz_trackid'),
             'musicbrainz_artistid': get_first('musicbrainz_artistid'),
             'musicbrainz_albumid': get_first('musicbrainz_albumid'),
@@ -0,0 +1,378 @@
+import os
+import time
+import struct
+import argparse
+
+# 轻量标签读取：只读取标签头部区域，跳过封面 (APIC / PICTURE / covr)、
+# 填充块与音频数据，返回与 mutagen easy 接口一致的文本字段。
+# 遇到不常见的结构 (ID3v2.2、反同步、压缩帧、非 FLAC/MP3/MP4 格式等)
+# 返回 None，由调用方回退到 mutagen。
+
+# 与 AudioFileHandler.get_tags 一致的字段
+FIELDS = [
+    'title', 'artist', 'album', 'albumartist', 'date',
+    'tracknumber', 'discnumber', 'genre',
+    'composer', 'lyricist', 'copyright',
+    'musicbrainz_trackid', 'musicbrainz_artistid', 'musicbrainz_albumid',
+]
+
+# 单个文本帧/原子的读取上限，超过则视为异常结构
+MAX_TEXT_SIZE = 1 << 20
+
+class _Unsupported(Exception):
+    """结构不在轻量读取器的支持范围内，需回退到 mutagen。"""
+
+class CountingFile:
+    """包装文件对象并统计实际读取的字节数 (用于基准测试)。"""
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+def _read_exact(f, size):
+    data = f.read(size)
+    if len(data) != size:
+        raise _Unsupported("文件意外结束")
+    return data
+
+# ================= FLAC =================
+
+def _parse_vorbis_comment(data):
+    tags = {}
+    vendor_len = struct.unpack_from('<I', data, 0)[0]
+    offset = 4 + vendor_len
+    count = struct.unpack_from('<I', data, offset)[0]
+    offset += 4
+    for _ in range(count):
+        length = struct.unpack_from('<I', data, offset)[0]
+        offset += 4
+        comment = data[offset:offset + length].decode('utf-8', 'replace')
+        offset += length
+        key, sep, value = comment.partition('=')
+        if sep:
+            tags.setdefault(key.lower(), value)
+    return tags
+
+def _read_flac(f):
+    if f.read(4) != b'fLaC':
+        raise _Unsupported("不是 FLAC 文件")
+    while True:
+        header = _read_exact(f, 4)
+        is_last = header[0] & 0x80
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:], 'big')
+        if block_type == 4:
+            # VORBIS_COMMENT：键名即 easy 接口的字段名
+            comments = _parse_vorbis_comment(_read_exact(f, length))
+            return {field: comments.get(field, '') for field in FIELDS}
+        # STREAMINFO / PADDING / SEEKTABLE / PICTURE 等直接跳过
+        f.seek(length, 1)
+        if is_last:
+            return {field: '' for field in FIELDS}
+
+# ================= MP3 (ID3v2.3 / v2.4) =================
+
+# 文本帧 -> easy 字段 (与 EasyID3 的映射一致)
+ID3_TEXT_FRAMES = {
+    'TIT2': 'title', 'TPE1': 'artist', 'TALB': 'album', 'TPE2': 'albumartist',
+    'TDRC': 'date', 'TYER': 'date', 'TRCK': 'tracknumber', 'TPOS': 'discnumber',
+    'TCON': 'genre', 'TCOM': 'composer', 'TEXT': 'lyricist', 'TCOP': 'copyright',
+}
+ID3_TXXX_FIELDS = {
+    'MusicBrainz Artist Id': 'musicbrainz_artistid',
+    'MusicBrainz Album Id': 'musicbrainz_albumid',
+}
+# ID3v1 能提供的字段
+ID3V1_FIELDS = ['title', 'artist', 'album', 'date', 'tracknumber', 'genre']
+ID3_ENCODINGS = {0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8'}
+
+def _syncsafe(data):
+    return (data[0] << 21) | (data[1] << 14) | (data[2] << 7) | data[3]
+
+def _decode_id3_text(data):
+    """解码文本帧，返回以空字符分隔的值列表。"""
+    encoding = ID3_ENCODINGS.get(data[0])
+    if encoding is None:
+        raise _Unsupported("未知的 ID3 文本编码")
+    text = data[1:].decode(encoding, 'replace')
+    # UTF-16 (带 BOM) 的每个值各自带 BOM，解码只会去掉第一个，其余值需单独去掉
+    return [v.lstrip('\ufeff') for v in text.split('\x00') if v.lstrip('\ufeff')]
+
+def _read_id3(f):
+    header = f.read(10)
+    if len(header) != 10 or header[:3] != b'ID3':
+        raise _Unsupported("没有 ID3v2 头")
+    version, flags = header[3], header[5]
+    # v2.2、反同步 (0x80)、扩展头 (0x40) 交给 mutagen
+    if version not in (3, 4) or flags & 0xC0:
+        raise _Unsupported("不常见的 ID3 结构")
+    tag_size = _syncsafe(header[6:10])
+
+    tags = {field: '' for field in FIELDS}
+    remaining = tag_size
+    while remaining >= 10:
+        frame_header = _read_exact(f, 10)
+        remaining -= 10
+        frame_id = frame_header[:4]
+        if frame_id[0] == 0:
+            break  # 进入填充区
+        size = _syncsafe(frame_header[4:8]) if version == 4 else struct.unpack('>I', frame_header[4:8])[0]
+        frame_flags = struct.unpack('>H', frame_header[8:10])[0]
+        if size > remaining:
+            raise _Unsupported("ID3 帧长度超出标签范围")
+        remaining -= size
+        frame_id = frame_id.decode('latin-1')
+
+        wanted = frame_id in ID3_TEXT_FRAMES or frame_id in ('TXXX', 'UFID', 'TDAT')
+        if not wanted or size > MAX_TEXT_SIZE:
+            # APIC 等大帧直接跳过，不读入内存
+            f.seek(size, 1)
+            continue
+        # 压缩/加密/反同步/数据长度指示的帧交给 mutagen
+        if (version == 3 and frame_flags & 0x00C0) or (version == 4 and frame_flags & 0x000F):
+            raise _Unsupported("压缩或加密的 ID3 帧")
+        data = _read_exact(f, size)
+        if not data:
+            continue
+        if frame_id == 'TDAT':
+            # mutagen 会把 v2.3 的 TYER + TDAT 合并为完整日期
+            raise _Unsupported("TYER/TDAT 日期")
+
+        if frame_id == 'UFID':
+            owner, _, ident = data.partition(b'\x00')
+            if owner == b'http://musicbrainz.org' and not tags['musicbrainz_trackid']:
+                tags['musicbrainz_trackid'] = ident.decode('ascii', 'replace')
+        elif frame_id == 'TXXX':
+            values = _decode_id3_text(data)
+            field = ID3_TXXX_FIELDS.get(values[0]) if values else None
+            if field and len(values) > 1 and not tags[field]:
+                tags[field] = values[1]
+        else:
+            values = _decode_id3_text(data)
+            field = ID3_TEXT_FRAMES[frame_id]
+            if values and not tags[field]:
+                # EasyID3 会把 "(13)" 之类的数字流派转换为名称，交给 mutagen 处理
+                if field == 'genre' and (values[0].startswith('(') or values[0].isdigit()):
+                    raise _Unsupported("数字流派")
+                tags[field] = values[0]
+
+    # mutagen 会用文件末尾的 ID3v1 补全 ID3v2 中缺失的字段，此时交给 mutagen
+    if any(not tags[field] for field in ID3V1_FIELDS):
+        f.seek(-128, os.SEEK_END)
+        if f.read(3) == b'TAG':
+            raise _Unsupported("ID3v1 需要合并")
+    return tags
+
+# ================= MP4 / M4A =================
+
+# ilst 原子 -> easy 字段。
+# EasyMP4 默认没有 composer / lyricist，src.common.audio 将其注册为 ©wrt 与 LYRICIST
+# (write_tags 写入的原子)，这里使用相同映射，保证与 mutagen 回退路径结果一致
+MP4_TEXT_ATOMS = {
+    b'\xa9nam': 'title', b'\xa9ART': 'artist', b'\xa9alb': 'album', b'aART': 'albumartist',
+    b'\xa9day': 'date', b'\xa9gen': 'genre', b'\xa9wrt': 'composer', b'cprt': 'copyright',
+}
+MP4_FREEFORM_FIELDS = {
+    b'MusicBrainz Track Id': 'musicbrainz_trackid',
+    b'MusicBrainz Artist Id': 'musicbrainz_artistid',
+    b'MusicBrainz Album Id': 'musicbrainz_albumid',
+    b'LYRICIST': 'lyricist',
+}
+
+def _iter_atoms(f, end):
+    """遍历 [当前位置, end) 范围内的原子，产出 (类型, 数据起点, 原子终点)。"""
+    while f.tell() + 8 <= end:
+        start = f.tell()
+        size, kind = struct.unpack('>I4s', _read_exact(f, 8))
+        data_start = start + 8
+        if size == 1:
+            size = struct.unpack('>Q', _read_exact(f, 8))[0]
+            data_start += 8
+        elif size == 0:
+            size = end - start
+        if size < data_start - start or start + size > end:
+            raise _Unsupported("MP4 原子长度异常")
+        yield kind, data_start, start + size
+        f.seek(start + size)
+
+def _find_atom(f, end, kind):
+    for atom_kind, data_start, atom_end in _iter_atoms(f, end):
+        if atom_kind == kind:
+            f.seek(data_start)
+            return atom_end
+    return None
+
+def _format_pair(payload):
+    """trkn/disk: 与 EasyMP4 一致，格式为 'n' 或 'n/total'。"""
+    if len(payload) < 6:
+        return ''
+    number, total = struct.unpack('>HH', payload[2:6])
+    return f"{number}/{total}" if total else str(number)
+
+def _read_mp4_item(f, end):
+    """读取 ilst 条目，返回 (mean, name, 第一个 data 载荷)。"""
+    mean = name = payload = None
+    for kind, data_start, atom_end in _iter_atoms(f, end):
+        if atom_end - data_start > MAX_TEXT_SIZE:
+            continue
+        if kind in (b'mean', b'name'):
+            value = _read_exact(f, atom_end - data_start)[4:]
+            if kind == b'mean':
+                mean = value
+            else:
+                name = value
+        elif kind == b'data' and payload is None:
+            payload = _read_exact(f, atom_end - data_start)[8:]
+    return mean, name, payload
+
+def _read_mp4(f):
+    f.seek(0, os.SEEK_END)
+    file_end = f.tell()
+    f.seek(0)
+    header = f.read(8)
+    if len(header) != 8 or header[4:8] != b'ftyp':
+        raise _Unsupported("不是 MP4 文件")
+    f.seek(0)
+
+    tags = {field: '' for field in FIELDS}
+    # moov -> udta -> meta -> ilst，其余原子 (mdat、trak 等) 只跳过不读取
+    moov_end = _find_atom(f, file_end, b'moov')
+    udta_end = moov_end and _find_atom(f, moov_end, b'udta')
+    meta_end = udta_end and _find_atom(f, udta_end, b'meta')
+    if not meta_end:
+        return tags
+    f.seek(4, 1)  # meta 是 full box，跳过 version/flags
+    ilst_end = _find_atom(f, meta_end, b'ilst')
+    if not ilst_end:
+        return tags
+
+    for kind, data_start, item_end in _iter_atoms(f, ilst_end):
+        if kind in MP4_TEXT_ATOMS:
+            field = MP4_TEXT_ATOMS[kind]
+            _, _, payload = _read_mp4_item(f, item_end)
+            if payload is not None and not tags[field]:
+                tags[field] = payload.decode('utf-8', 'replace')
+        elif kind in (b'trkn', b'disk'):
+            _, _, payload = _read_mp4_item(f, item_end)
+            if payload is not None:
+                tags['tracknumber' if kind == b'trkn' else 'discnumber'] = _format_pair(payload)
+        elif kind == b'----':
+            mean, name, payload = _read_mp4_item(f, item_end)
+            field = MP4_FREEFORM_FIELDS.get(name) if mean == b'com.apple.iTunes' else None
+            if field and payload is not None:
+                tags[field] = payload.decode('utf-8', 'replace')
+        # covr 等其它条目不读取
+    return tags
+
+# ================= 入口 =================
+
+READERS = {
+    '.flac': _read_flac,
+    '.mp3': _read_id3,
+    '.m4a': _read_mp4,
+    '.mp4': _read_mp4,
+}
+
+def read_tags_fast(file_path, fileobj=None):
+    """
+    轻量读取标签，返回包含 FIELDS 全部键的字典 (缺失字段为空字符串)。
+    不支持的格式或结构返回 None，调用方应回退到 mutagen。
+    fileobj: 可选的已打开文件对象 (用于统计读取字节数)
+    """
+    reader = READERS.get(os.path.splitext(file_path)[1].lower())
+    if reader is None:
+        return None
+    try:
+        if fileobj is not None:
+            return reader(fileobj)
+        with open(file_path, 'rb') as f:
+            return reader(f)
+    except (_Unsupported, struct.error, UnicodeDecodeError, IndexError, OSError):
+        return None
+
+# ================= 基准测试 =================
+
+def _read_tags_mutagen(file_path, fileobj):
+    """与 AudioFileHandler.get_tags 相同的完整 mutagen 读取 (作为对照)。"""
+    import mutagen
+    import src.common.audio  # noqa: F401  注册 EasyMP4 的 composer / lyricist 键
+    audio = mutagen.File(fileobj, easy=True)
+    if audio is None:
+        return None
+    return {field: audio.get(field, [''])[0] for field in FIELDS}
+
+def benchmark(folder, limit=None):
+    from src.common.audio import AUDIO_EXTENSIONS
+
+    files = []
+    for dirpath, _, filenames in os.walk(folder):
+        files.extend(os.path.join(dirpath, n) for n in sorted(filenames) if n.lower().endswith(AUDIO_EXTENSIONS))
+    files = files[:limit] if limit else files
+    if not files:
+        print("未找到支持的音频文件。")
+        return
+
+    readers = (('mutagen', _read_tags_mutagen), ('fast', read_tags_fast))
+
+    # 预热：先用两个读取器各读一遍 (不计时)，使文件都进入系统缓存，
+    # 否则先运行的读取器要承担冷缓存的磁盘读取，对比会偏向后运行的一方
+    for path in files:
+        for _, reader in readers:
+            with open(path, 'rb') as f:
+                try:
+                    reader(path, f)
+                except Exception:
+                    pass
+
+    results = {}
+    for label, reader in readers:
+        total_bytes = 0
+        outputs = {}
+        start = time.perf_counter()
+        for path in files:
+            with open(path, 'rb') as raw:
+                f = CountingFile(raw)
+                try:
+                    outputs[path] = reader(path, f)
+                except Exception:
+                    outputs[path] = None
+                total_bytes += f.bytes_read
+        elapsed = time.perf_counter() - start
+        results[label] = (elapsed, total_bytes, outputs)
+
+    print(f"文件数: {len(files)}")
+    print(f"{'读取器':<10} | {'文件/秒':>10} | {'平均读取字节/文件':>18}")
+    print("-" * 46)
+    for label, (elapsed, total_bytes, _) in results.items():
+        rate = len(files) / elapsed if elapsed else float('inf')
+        print(f"{label:<10} | {rate:>10.1f} | {total_bytes / len(files):>18.0f}")
+
+    fast_out, full_out = results['fast'][2], results['mutagen'][2]
+    fallback = sum(1 for p in files if fast_out[p] is None)
+    mismatch = [p for p in files if fast_out[p] is not None and full_out[p] is not None and fast_out[p] != full_out[p]]
+    print(f"\n需回退到 mutagen: {fallback} | 结果不一致: {len(mismatch)}")
+    for path in mismatch[:10]:
+        diff = {k: (full_out[path][k], fast_out[path][k]) for k in FIELDS if full_out[path][k] != fast_out[path][k]}
+        print(f"  {path}: {diff}")
+
+def main():
+    parser = argparse.ArgumentParser(description="对比轻量标签读取与 mutagen 完整读取的速度和读取量")
+    parser.add_argument("folder_path", help="包含音频文件的文件夹 (递归)")
+    parser.add_argument("--limit", type=int, help="最多测试的文件数")
+    args = parser.parse_args()
+
+    folder = args.folder_path.strip().strip("'").strip('"')
+    if not os.path.isdir(folder):
+        print("文件夹未找到。")
+        return
+    benchmark(folder, limit=args.limit)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import sys
+import time
+import sqlite3
+import argparse
+
+from src.common.audio import AUDIO_EXTENSIONS, AudioFileHandler
+from src.common.fastread import read_tags_fast
+
+# 写入索引的标签字段 (与 AudioFileHandler.get_tags 的键一致)
+TAG_FIELDS = [
+    'title', 'artist', 'album', 'albumartist', 'date',
+    'tracknumber', 'discnumber', 'genre',
+    'composer', 'lyricist', 'copyright',
+    'musicbrainz_trackid', 'musicbrainz_artistid', 'musicbrainz_albumid',
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    scanned_at REAL NOT NULL,
+    error TEXT,
+    {', '.join(f"{field} TEXT NOT NULL DEFAULT ''" for field in TAG_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS idx_files_dir ON files(dir);
+"""
+
+class LibraryIndex:
+    """
+    本地 SQLite 标签索引。
+    按 (size, mtime) 增量更新，只重新读取发生变化的文件。
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- 扫描 ----------
+
+    def scan(self, root):
+        """
+        扫描目录并更新索引。
+        返回统计字典: added / updated / unchanged / removed / errors。
+        """
+        root = os.path.abspath(root)
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'errors': 0}
+
+        known = {
+            row['path']: (row['size'], row['mtime'])
+            for row in self.conn.execute(
+                "SELECT path, size, mtime FROM files WHERE substr(path, 1, ?) = ?",
+                _prefix_params(root),
+            )
+        }
+        seen = set()
+
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+
+                old = known.get(path)
+                if old == (st.st_size, st.st_mtime):
+                    stats['unchanged'] += 1
+                    continue
+
+                tags, error = read_tags(path)
+                if error:
+                    stats['errors'] += 1
+                self._upsert(path, st, tags, error)
+                stats['updated' if old else 'added'] += 1
+                # 定期提交，避免大型曲库扫描中断后全部重来
+                if (stats['added'] + stats['updated']) % 500 == 0:
+                    self.conn.commit()
+
+        removed = [p for p in known if p not in seen]
+        self.conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in removed])
+        stats['removed'] = len(removed)
+        self.conn.commit()
+        return stats
+
+    def _upsert(self, path, st, tags, error):
+        columns = ['path', 'dir', 'size', 'mtime', 'scanned_at', 'error'] + TAG_FIELDS
+        values = [path, os.path.dirname(path), st.st_size, st.st_mtime, time.time(), error]
+        values += [tags.get(field) or '' for field in TAG_FIELDS]
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in columns)})",
+            values,
+        )
+
+    # ---------- 查询 ----------
+
+    def query(self, missing=None, mixed_album_ids=False, under=None, errors=False):
+        """
+        按条件查询文件路径 (按路径排序)。
+        missing: 字段列表，任一字段为空即命中 (如 ['composer', 'lyricist'])；
+                 读取失败的文件所有字段均为空，不计入
+        mixed_album_ids: 只保留同一目录 (专辑) 内 musicbrainz_albumid 不一致的文件
+        under: 只查询该目录下的文件
+        errors: 只查询读取失败的文件
+        """
+        where, params = [], []
+
+        for field in missing or []:
+            if field not in TAG_FIELDS:
+                raise ValueError(f"未知字段: {field}")
+        if missing:
+            where.append("error IS NULL")
+            where.append("(" + " OR ".join(f"{field} = ''" for field in missing) + ")")
+
+        if errors:
+            where.append("error IS NOT NULL")
+
+        if mixed_album_ids:
+            where.append(
+                "dir IN (SELECT dir FROM files WHERE musicbrainz_albumid != '' "
+                "GROUP BY dir HAVING COUNT(DISTINCT musicbrainz_albumid) > 1)"
+            )
+
+        if under:
+            under = os.path.abspath(under)
+            where.append("substr(path, 1, ?) = ?")
+            params += _prefix_params(under)
+
+        sql = "SELECT path FROM files"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY path"
+        return [row['path'] for row in self.conn.execute(sql, params)]
+
+def read_tags(path):
+    """
+    读取单个文件的标签。
+    优先使用轻量读取器 (跳过封面等大块数据)，不支持时回退到 mutagen。
+    返回 (tags, error)；读取失败时 tags 为空字典，error 为错误信息。
+    """
+    tags = read_tags_fast(path)
+    if tags is not None:
+        return tags, None
+    try:
+        return AudioFileHandler(path).get_tags(), None
+    except Exception as e:
+        return {}, str(e)
+
+def _prefix_params(folder):
+    """
+    构造匹配目录下所有路径的 substr 参数 (长度, 前缀)。
+    不使用 LIKE：SQLite 的 LIKE 对 ASCII 不区分大小写，会把 Rock/ 与 rock/ 视为同一目录。
+    """
+    prefix = os.path.join(folder, '')
+    return (len(prefix), prefix)
+
+# ================= 命令行 =================
+
+def main():
+    parser = argparse.ArgumentParser(description="本地曲库标签索引 (扫描 / 查询)")
+    parser.add_argument("--db", default="library.db", help="索引数据库路径 (默认 library.db)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_scan = sub.add_parser("scan", help="扫描目录并增量更新索引")
+    p_scan.add_argument("folder_path", help="曲库根目录")
+
+    p_query = sub.add_parser("query", help="查询索引，每行输出一个文件路径")
+    p_query.add_argument("--missing", action="append", default=[], choices=TAG_FIELDS, metavar="FIELD",
+                         help="字段为空的文件，可重复 (任一为空即命中)，如 --missing composer")
+    p_query.add_argument("--mixed-album-ids", action="store_true",
+                         help="同一目录 (专辑) 内 musicbrainz_albumid 不一致的文件")
+    p_query.add_argument("--under", help="只查询该目录下的文件")
+    p_query.add_argument("--errors", action="store_true", help="读取失败的文件 (损坏或不支持的文件)")
+    args = parser.parse_args()
+
+    index = LibraryIndex(args.db)
+    try:
+        if args.command == "scan":
+            folder = args.folder_path.strip().strip("'").strip('"')
+            if not os.path.isdir(folder):
+                print("文件夹未找到。")
+                return
+            print(f"正在扫描: {folder} ...")
+            stats = index.scan(folder)
+            print(f"扫描完成: 新增 {stats['added']} | 更新 {stats['updated']} | 未变化 {stats['unchanged']} | "
+                  f"移除 {stats['removed']} | 读取失败 {stats['errors']}")
+        else:
+            paths = index.query(missing=args.missing, mixed_album_ids=args.mixed_album_ids, under=args.under,
+                                errors=args.errors)
+            for path in paths:
+                print(path)
+            print(f"共 {len(paths)} 个文件。", file=sys.stderr)
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+from abc import ABC, abstractmethod
+
+class MetadataProvider(ABC):
+    """
+    元数据来源接口。
+    每个来源 (MusicBrainz / Apple Music) 根据本地标签返回一份远程元数据字典，
+    键使用标准标签名称 (title, artist, composer, musicbrainz_trackid 等)。
+    返回的字典另含 'album_id'：该来源自己的专辑标识 (Apple collectionId /
+    MusicBrainz 发行 ID)，用于在同一文件夹内固定专辑，不会写入文件。
+    """
+    # 来源名称，用于合并时的字段优先级配置
+    name = ''
+
+    @abstractmethod
+    def resolve(self, local_meta, pin=None):
+        """
+        根据本地元数据自动选择最佳匹配 (非交互)，返回远程元数据字典。
+        pin: 该来源的专辑标识；给出时只接受该专辑内的结果。
+        未找到结果时返回空字典。
+        """
+
+    def close(self):
+        """释放来源持有的资源 (如浏览器驱动)。"""
+        pass
@@ -0,0 +1,187 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+# 视为限流/过载的 HTTP 状态码 (Apple 搜索接口在持续高负载时返回 403/429)
+THROTTLE_STATUS = (403, 429, 503)
+
+# 单个请求最多重试次数
+MAX_RETRIES = 4
+
+# 未提供 Retry-After 时的退避上限 (秒)
+MAX_BACKOFF = 60.0
+
+class AdaptiveLimiter:
+    """
+    AIMD 并发控制器：
+    - 请求成功且并发已达上限时加性增加上限 (每轮约 +1)；
+      未用满上限时不增加，否则串行调用也会把上限推高，统计中的上限失去意义
+    - 遇到限流或超时时乘性降低上限，并在退避期内暂停发出新请求
+    - 服务端提供 Retry-After 时以其为准
+    """
+    def __init__(self, name, initial=2, min_limit=1, max_limit=16, decrease=0.5):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self.stats = {'ok': 0, 'throttled': 0, 'retries': 0, 'failed': 0}
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """等待直到有空闲并发槽且不在退避期内。"""
+        with self.cond:
+            while True:
+                wait = self.blocked_until - time.time()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.cond.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, throttled=False, retry_after=None, failed=False):
+        """
+        归还并发槽并根据结果调整上限。
+        failed: 与限流无关的错误 (如响应解码失败)，只计数，不调整上限。
+        """
+        with self.cond:
+            binding = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if failed:
+                self.stats['failed'] += 1
+            elif throttled:
+                self.stats['throttled'] += 1
+                self.consecutive_throttles += 1
+                old = int(self.limit)
+                # 同一退避期内的多个限流响应只降低一次上限
+                if time.time() >= self.blocked_until:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                if retry_after is None:
+                    # 指数退避 + 抖动，避免所有请求同时恢复
+                    retry_after = min(MAX_BACKOFF, 2 ** (self.consecutive_throttles - 1)) + random.uniform(0, 0.5)
+                self.blocked_until = max(self.blocked_until, time.time() + retry_after)
+                print(f"[限流] {self.name}: 并发上限 {old} -> {int(self.limit)}，{retry_after:.1f}s 后重试")
+            else:
+                self.stats['ok'] += 1
+                self.consecutive_throttles = 0
+                if binding:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self.cond.notify_all()
+
+    def note_retry(self):
+        with self.cond:
+            self.stats['retries'] += 1
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                'name': self.name,
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                **self.stats,
+            }
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name, **config):
+    """
+    按名称 (通常为主机名) 获取共享的控制器，同一主机的所有请求共用一个。
+    config 仅在首次创建时生效。
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = AdaptiveLimiter(name, **config)
+        return _limiters[name]
+
+def format_limiter_stats():
+    """返回所有控制器的状态摘要，用于状态/统计输出。"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    parts = []
+    for limiter in limiters:
+        s = limiter.snapshot()
+        parts.append(f"{s['name']} 上限 {s['limit']} (进行中 {s['in_flight']}, 成功 {s['ok']}, "
+                     f"限流 {s['throttled']}, 重试 {s['retries']}, 失败 {s['failed']})")
+    return " | ".join(parts)
+
+def parse_retry_after(value):
+    """解析 Retry-After (秒数或 HTTP 日期)，无法解析时返回 None。"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def request(method, url, session=None, max_retries=MAX_RETRIES, **kwargs):
+    """
+    经过自适应控制器发送 HTTP 请求。
+    限流状态码或超时/连接错误时退避并重试，而不是直接放弃。
+    重试耗尽后：限流响应原样返回 (由调用方 raise_for_status)，网络异常则抛出。
+    """
+    http = session or requests
+    limiter = get_limiter(urlparse(url).netloc)
+
+    for attempt in range(max_retries + 1):
+        if attempt:
+            limiter.note_retry()
+        limiter.acquire()
+        try:
+            res = http.request(method, url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError):
+            limiter.release(throttled=True)
+            if attempt == max_retries:
+                raise
+            continue
+        except BaseException:
+            # 其它异常 (ChunkedEncodingError、TooManyRedirects 等) 也必须归还并发槽，
+            # 否则该槽被永久占用，之后的请求会在 acquire() 中一直等待
+            limiter.release(failed=True)
+            raise
+
+        if res.status_code in THROTTLE_STATUS:
+            limiter.release(throttled=True, retry_after=parse_retry_after(res.headers.get('Retry-After')))
+            if attempt == max_retries:
+                return res
+            continue
+
+        limiter.release()
+        return res
+
+def call_with_retry(limiter, func, classify_error, max_retries=MAX_RETRIES):
+    """
+    经过控制器调用任意函数 (用于不直接使用 requests 的客户端，如 musicbrainzngs)。
+    classify_error(exc) 返回 (是否限流, retry_after)；非限流异常直接抛出。
+    客户端自身已会重试时传入 max_retries=0：限流异常仍会让控制器退避，但不再重复重试。
+    """
+    for attempt in range(max_retries + 1):
+        if attempt:
+            limiter.note_retry()
+        limiter.acquire()
+        try:
+            result = func()
+        except Exception as e:
+            throttled, retry_after = classify_error(e)
+            if not throttled:
+                limiter.release(failed=True)
+                raise
+            limiter.release(throttled=True, retry_after=retry_after)
+            if attempt == max_retries:
+                raise
+            continue
+        except BaseException:
+            # 如 KeyboardInterrupt：同样归还并发槽
+            limiter.release(failed=True)
+            raise
+        limiter.release()
+        return result
@@ -6,6 +6,7 @@ from src.musicbrainz.client import MusicBrainzClient
 def main():
     parser = argparse.ArgumentParser(description="Music Tagger 命令行工具")
     parser.add_argument("path", help="音乐文件路径")
+    parser.add_argument("--local-db", metavar="DB", help="使用本地 MusicBrainz 镜像数据库 (由 run_mb_import.py 生成) 代替在线 API")
     args = parser.parse_args()
 
     filepath = args.path
@@ -23,7 +24,14 @@ def main():
         return
 
     # 2. 搜索 MusicBrainz
-    mb_client = MusicBrainzClient()
+    try:
+        if args.local_db:
+            mb_client = MusicBrainzClient(backend='local', db_path=args.local_db)
+        else:
+            mb_client = MusicBrainzClient()
+    except (OSError, ValueError) as e:
+        print(f"初始化 MusicBrainz 失败: {e}")
+        return
     print("\n正在搜索 MusicBrainz...")
     
     # 如果可用，使用现有标签进行搜索，否则询问用户？
@@ -63,66 +71,8 @@ def main():
                 selected = results[index]
                 
                 # 准备新标签
-                new_tags = {
-                    'title': selected.get('title'),
-                    'musicbrainz_trackid': selected.get('id'),
-                }
-                
-                # 获取艺术家信息
-                artist_credit = selected.get('artist-credit', [])
-                if artist_credit:
-                     new_tags['artist'] = artist_credit[0]['artist']['name']
-                     if 'artist' in artist_credit[0]:
-                         new_tags['musicbrainz_artistid'] = artist_credit[0]['artist']['id']
-
-                # 获取专辑信息
-                releases = selected.get('release-list', [])
-                if releases:
-                    release = releases[0]
-                    new_tags['album'] = release.get('title')
-                    new_tags['date'] = release.get('date')
-                    new_tags['musicbrainz_albumid'] = release.get('id')
-                    
-                    # 如果可用，获取专辑艺术家（通常与艺术家相同，但最好有）
-                    # 搜索结果可能没有完整的发行艺术家信用，检查是否存在
-                    # 目前，如果搜索结果中没有，我们可能需要获取发行信息以获取详细信息
-                    # 但让我们检查一下搜索结果中通常有什么。
-                    # 通常 release-list 项目也有 'artist-credit'。
-                    
-                    # 尝试获取光盘编号和轨道编号（如果搜索结果中可用）（通常有限）
-                    # 如果我们想要健壮的数据，我们可能应该在这里调用 get_release_by_id
-                    # 但为了保持快速，让我们看看我们能得到什么。
-                    # 如果缺少 'medium-list'，我们可能会暂时跳过光盘编号或获取它。
-                    
-                    # 让我们快速获取特定发行的详细轨道信息
-                    # 这确保我们获得正确的轨道编号、光盘编号和专辑艺术家
-                    try:
-                        release_info = mb_client.get_release_info(release.get('id'))
-                        if release_info:
-                            # 更新专辑艺术家
-                            rel_artist_credit = release_info.get('artist-credit', [])
-                            if rel_artist_credit:
-                                new_tags['albumartist'] = rel_artist_credit[0]['artist']['name']
-                            
-                            # 在发行中找到我们的轨道以获取轨道/光盘编号
-                            # 这有点复杂，因为发行有媒体 -> 轨道
-                            # 我们通过录音 ID 匹配
-                            for medium in release_info.get('medium-list', []):
-                                for track in medium.get('track-list', []):
-                                    if track.get('recording', {}).get('id') == selected.get('id'):
-                                        new_tags['tracknumber'] = track.get('number')
-                                        new_tags['discnumber'] = str(medium.get('position'))
-                                        break
-                    except Exception as e:
-                        print(f"警告: 无法获取详细发行信息: {e}")
+                new_tags = mb_client.build_tags(selected)
 
-                # 获取流派 (标签)
-                tags_list = selected.get('tag-list', [])
-                if tags_list:
-                    # 连接前 3 个标签或类似标签
-                    genres = [t['name'] for t in tags_list[:3]]
-                    new_tags['genre'] = ', '.join(genres)
-                
                 # 预览比较
                 print("\n--- 标签预览 ---")
                 print(f"{'标签':<20} {'当前值':<30} {'新值':<30}")
@@ -1,16 +1,58 @@
+import sqlite3
 import musicbrainzngs
 
-class MusicBrainzClient:
-    def __init__(self, app_name="MusicTagger", version="0.1", contact="user@example.com"):
+from src.common import throttle
+from src.common.provider import MetadataProvider
+from src.musicbrainz.mirror import MusicBrainzMirror
+
+def _classify_error(e):
+    """
+    判断 musicbrainzngs 异常是否为限流/网络问题，返回 (是否限流, retry_after)。
+    到达这里的异常已被 musicbrainzngs 重试过，只用于让控制器退避。
+    """
+    if isinstance(e, musicbrainzngs.NetworkError):
+        return True, None
+    if isinstance(e, musicbrainzngs.ResponseError):
+        cause = getattr(e, 'cause', None)
+        if getattr(cause, 'code', None) in throttle.THROTTLE_STATUS:
+            headers = getattr(cause, 'headers', None) or {}
+            return True, throttle.parse_retry_after(headers.get('Retry-After'))
+    return False, None
+
+class MusicBrainzClient(MetadataProvider):
+    """
+    MusicBrainz 查询客户端。
+    backend='api' 使用公共 Web API；backend='local' 使用 mirror.py 导入的本地 SQLite 镜像
+    (需提供 db_path)，两者返回相同结构的字典。
+    """
+    name = 'musicbrainz'
+
+    def __init__(self, app_name="MusicTagger", version="0.1", contact="user@example.com",
+                 backend='api', db_path=None):
+        if backend not in ('api', 'local'):
+            raise ValueError(f"未知的 MusicBrainz 后端: {backend}")
+        self.backend = backend
+        self.mirror = MusicBrainzMirror(db_path) if backend == 'local' else None
         self.setup(app_name, version, contact)
 
     def setup(self, app_name, version, contact):
         musicbrainzngs.set_useragent(app_name, version, contact)
+        # 公共 API 限制 1 次/秒 (由 musicbrainzngs 控制)。
+        # musicbrainzngs 已在内部对 503 与网络错误退避重试 (最多 8 次)，且无法关闭，
+        # 因此这里不再重试 (max_retries=0)，控制器只负责串行化、统计与后续请求的退避
+        self.limiter = throttle.get_limiter('musicbrainz.org', initial=1, max_limit=1)
 
     def search_recording(self, title, artist=None, album=None, limit=5):
         """
         根据标题以及可选的艺术家/专辑搜索录音。
         """
+        if self.mirror:
+            try:
+                return self.mirror.search_recordings(title, artist=artist, album=album, limit=limit)
+            except sqlite3.Error as e:
+                print(f"查询本地镜像出错: {e}")
+                return []
+
         query_parts = [f'recording:"{title}"']
         if artist:
             query_parts.append(f'artist:"{artist}"')
@@ -20,7 +62,12 @@ class MusicBrainzClient:
         query = " AND ".join(query_parts)
         
         try:
-            result = musicbrainzngs.search_recordings(query=query, limit=limit)
+            result = throttle.call_with_retry(
+                self.limiter,
+                lambda: musicbrainzngs.search_recordings(query=query, limit=limit),
+                _classify_error,
+                max_retries=0,
+            )
             return result.get('recording-list', [])
         except Exception as e:
             print(f"搜索 MusicBrainz 出错: {e}")
@@ -30,9 +77,108 @@ class MusicBrainzClient:
         """
         获取特定发行的详细信息。
         """
+        if self.mirror:
+            try:
+                return self.mirror.get_release(release_id)
+            except sqlite3.Error as e:
+                print(f"查询本地镜像出错: {e}")
+                return None
+
         try:
-            result = musicbrainzngs.get_release_by_id(release_id, includes=['recordings', 'artists'])
+            result = throttle.call_with_retry(
+                self.limiter,
+                lambda: musicbrainzngs.get_release_by_id(release_id, includes=['recordings', 'artists']),
+                _classify_error,
+                max_retries=0,
+            )
             return result.get('release', {})
         except Exception as e:
             print(f"获取发行信息出错: {e}")
             return None
+
+    def build_tags(self, recording, release_id=None):
+        """
+        根据搜索得到的录音构建标签字典。
+        release_id: 使用 release-list 中的指定发行，默认取第一个。
+        会额外获取发行详情以得到专辑艺术家、轨道编号与光盘编号。
+        """
+        new_tags = {
+            'title': recording.get('title'),
+            'musicbrainz_trackid': recording.get('id'),
+        }
+
+        # 获取艺术家信息
+        artist_credit = recording.get('artist-credit', [])
+        if artist_credit:
+            new_tags['artist'] = artist_credit[0]['artist']['name']
+            if 'artist' in artist_credit[0]:
+                new_tags['musicbrainz_artistid'] = artist_credit[0]['artist']['id']
+
+        # 获取专辑信息
+        releases = recording.get('release-list', [])
+        if release_id:
+            releases = [r for r in releases if r.get('id') == release_id]
+        if releases:
+            release = releases[0]
+            new_tags['album'] = release.get('title')
+            new_tags['date'] = release.get('date')
+            new_tags['musicbrainz_albumid'] = release.get('id')
+
+            # 搜索结果中的 release-list 通常缺少 'medium-list'，
+            # 获取特定发行的详细轨道信息，
+            # 这确保我们获得正确的轨道编号、光盘编号和专辑艺术家
+            try:
+                release_info = self.get_release_info(release.get('id'))
+                if release_info:
+                    # 更新专辑艺术家
+                    rel_artist_credit = release_info.get('artist-credit', [])
+                    if rel_artist_credit:
+                        new_tags['albumartist'] = rel_artist_credit[0]['artist']['name']
+
+                    # 在发行中找到我们的轨道以获取轨道/光盘编号
+                    # 发行有媒体 -> 轨道，我们通过录音 ID 匹配
+                    for medium in release_info.get('medium-list', []):
+                        for track in medium.get('track-list', []):
+                            if track.get('recording', {}).get('id') == recording.get('id'):
+                                # 带上总数 ('3/12'、'1/2')，写入时不会丢失文件中原有的总数信息；
+                                # 黑胶等非数字编号 (如 'A1') 保持原样
+                                number = track.get('number') or ''
+                                track_count = medium.get('track-count') or len(medium.get('track-list', []))
+                                new_tags['tracknumber'] = f"{number}/{track_count}" if number.isdigit() and track_count else number
+                                new_tags['discnumber'] = f"{medium.get('position')}/{len(release_info['medium-list'])}"
+                                break
+            except Exception as e:
+                print(f"警告: 无法获取详细发行信息: {e}")
+
+        # 获取流派 (标签)
+        tags_list = recording.get('tag-list', [])
+        if tags_list:
+            # 连接前 3 个标签
+            genres = [t['name'] for t in tags_list[:3]]
+            new_tags['genre'] = ', '.join(genres)
+
+        return new_tags
+
+    def resolve(self, local_meta, pin=None):
+        """
+        取搜索结果的第一项作为匹配 (非交互)。
+        pin 为发行 ID 时，只接受出现在该发行中的录音。
+        """
+        results = self.search_recording(
+            local_meta.get('title'),
+            artist=local_meta.get('artist'),
+            album=local_meta.get('album'),
+            # 固定发行时多取一些结果，目标发行未必排在前面
+            limit=25 if pin else 5,
+        )
+        if pin:
+            results = [r for r in results if any(rel.get('id') == pin for rel in r.get('release-list', []))]
+        if not results:
+            return {}
+        tags = self.build_tags(results[0], release_id=pin)
+        tags['album_id'] = tags.get('musicbrainz_albumid')
+        return tags
+
+    def close(self):
+        if self.mirror:
+            self.mirror.close()
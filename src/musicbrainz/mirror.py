@@ -0,0 +1,313 @@
+import os
+import io
+import gzip
+import lzma
+import json
+import sqlite3
+import tarfile
+import argparse
+
+# ================= 数据库结构 =================
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL DEFAULT '',
+    artist_id TEXT NOT NULL DEFAULT '',
+    artist_name TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS media (
+    release_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    format TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (release_id, position)
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    release_id TEXT NOT NULL,
+    medium_position INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    id TEXT NOT NULL DEFAULT '',
+    number TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL,
+    recording_id TEXT NOT NULL,
+    PRIMARY KEY (release_id, medium_position, position)
+);
+CREATE INDEX IF NOT EXISTS idx_tracks_recording ON tracks(recording_id);
+CREATE TABLE IF NOT EXISTS recordings (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist_id TEXT NOT NULL DEFAULT '',
+    artist_name TEXT NOT NULL DEFAULT ''
+);
+-- 每条轨道一行 (rowid 与 tracks 的 rowid 相同)，可按录音名、艺术家名、发行名全文检索
+CREATE VIRTUAL TABLE IF NOT EXISTS recording_fts USING fts5(
+    recording, artist, release,
+    recording_id UNINDEXED, release_id UNINDEXED
+);
+"""
+
+# 查询所需的表，用于识别有效的镜像数据库
+REQUIRED_TABLES = {'releases', 'media', 'tracks', 'recordings', 'recording_fts'}
+
+def _first_artist(credit):
+    """返回 artist-credit 中第一位艺术家的 (id, name)。"""
+    if credit:
+        artist = credit[0].get('artist') or {}
+        return artist.get('id', ''), artist.get('name', '')
+    return '', ''
+
+def _credit(artist_id, artist_name):
+    """构造与 musicbrainzngs 相同结构的 artist-credit 列表。"""
+    if not artist_id and not artist_name:
+        return []
+    return [{'artist': {'id': artist_id, 'name': artist_name}}]
+
+# ================= 导入 =================
+
+def open_dump(dump_path):
+    """
+    打开 MusicBrainz 发行 JSON 转储，逐行产出 JSON 字符串。
+    支持官方的 release.tar.xz (读取其中的 mbdump/release)、
+    以及按行存储的 .json / .jsonl / .gz / .xz 文件 (例如过滤后的子集)。
+    """
+    if tarfile.is_tarfile(dump_path):
+        with tarfile.open(dump_path) as tar:
+            for member in tar:
+                if member.isfile() and os.path.basename(member.name) == 'release':
+                    with io.TextIOWrapper(tar.extractfile(member), encoding='utf-8') as f:
+                        yield from f
+                    return
+        raise ValueError(f"转储中未找到 mbdump/release: {dump_path}")
+
+    if dump_path.endswith('.gz'):
+        opener = gzip.open
+    elif dump_path.endswith('.xz'):
+        opener = lzma.open
+    else:
+        opener = open
+    with opener(dump_path, 'rt', encoding='utf-8') as f:
+        yield from f
+
+def import_release(conn, release):
+    """写入单个发行 (及其媒体、轨道、录音)。"""
+    release_id = release['id']
+    artist_id, artist_name = _first_artist(release.get('artist-credit'))
+    existed = conn.execute("SELECT 1 FROM releases WHERE id = ?", (release_id,)).fetchone()
+    conn.execute(
+        "INSERT OR REPLACE INTO releases (id, title, date, artist_id, artist_name) VALUES (?, ?, ?, ?, ?)",
+        (release_id, release.get('title', ''), release.get('date') or '', artist_id, artist_name),
+    )
+    if existed:
+        # 重新导入同一发行时先清除旧的轨道与索引行。
+        # 索引行按 tracks 的 rowid 删除：FTS 表上按 release_id 过滤需要扫描全表，导入会变成平方复杂度
+        conn.execute(
+            "DELETE FROM recording_fts WHERE rowid IN (SELECT rowid FROM tracks WHERE release_id = ?)",
+            (release_id,),
+        )
+        conn.execute("DELETE FROM media WHERE release_id = ?", (release_id,))
+        conn.execute("DELETE FROM tracks WHERE release_id = ?", (release_id,))
+
+    for medium in release.get('media', []):
+        position = medium.get('position') or 1
+        conn.execute(
+            "INSERT OR REPLACE INTO media (release_id, position, format) VALUES (?, ?, ?)",
+            (release_id, position, medium.get('format') or ''),
+        )
+        for track in medium.get('tracks', []):
+            recording = track.get('recording') or {}
+            if not recording.get('id'):
+                continue
+            rec_artist_id, rec_artist_name = _first_artist(
+                recording.get('artist-credit') or track.get('artist-credit') or release.get('artist-credit')
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO recordings (id, title, artist_id, artist_name) VALUES (?, ?, ?, ?)",
+                (recording['id'], recording.get('title', ''), rec_artist_id, rec_artist_name),
+            )
+            # 转储中同一位置重复出现的轨道只保留第一条，保证每个索引行都对应一条轨道
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO tracks (id, release_id, medium_position, position, number, title, recording_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (track.get('id') or '', release_id, position,
+                 track.get('position') or 0, track.get('number') or '', track.get('title', ''), recording['id']),
+            )
+            if cursor.rowcount != 1:
+                continue
+            conn.execute(
+                "INSERT INTO recording_fts (rowid, recording, artist, release, recording_id, release_id) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (cursor.lastrowid, recording.get('title', ''), rec_artist_name, release.get('title', ''),
+                 recording['id'], release_id),
+            )
+
+def import_dump(dump_path, db_path, artist_filter=None, limit=None):
+    """
+    将发行 JSON 转储导入本地 SQLite 镜像。
+    artist_filter: 只导入发行艺术家名称包含该字符串的发行 (不区分大小写)
+    limit: 最多导入的发行数量
+    返回导入的发行数量。
+    """
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    needle = artist_filter.lower() if artist_filter else None
+    count = 0
+    try:
+        for line in open_dump(dump_path):
+            line = line.strip()
+            if not line:
+                continue
+            release = json.loads(line)
+            if needle and needle not in _first_artist(release.get('artist-credit'))[1].lower():
+                continue
+            import_release(conn, release)
+            count += 1
+            if count % 1000 == 0:
+                conn.commit()
+                print(f"已导入 {count} 个发行...")
+            if limit and count >= limit:
+                break
+        conn.commit()
+    finally:
+        conn.close()
+    return count
+
+# ================= 查询 =================
+
+def _fts_phrase(column, text):
+    """构造 FTS5 列限定的短语查询，转义双引号。"""
+    return f'{column} : "{text.replace(chr(34), chr(34) * 2)}"'
+
+class MusicBrainzMirror:
+    """
+    本地 MusicBrainz 镜像查询。
+    返回与 musicbrainzngs 相同结构的字典 (recording-list / medium-list / track-list)，
+    因此 cli.py 无需区分数据来源。
+    """
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"本地镜像数据库不存在: {db_path}")
+        # check_same_thread=False: 合并模式下会在工作线程中查询
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # 指向其它 SQLite 文件 (如 library.db) 时在这里报错，而不是在第一次查询时崩溃
+        try:
+            tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        except sqlite3.DatabaseError as e:
+            self.conn.close()
+            raise ValueError(f"无法读取本地镜像数据库 {db_path}: {e}")
+        missing = REQUIRED_TABLES - tables
+        if missing:
+            self.conn.close()
+            raise ValueError(f"不是 MusicBrainz 镜像数据库 (缺少表: {', '.join(sorted(missing))}): {db_path}")
+
+    def close(self):
+        self.conn.close()
+
+    def _match(self, title, artist=None, album=None, limit=5):
+        parts = [_fts_phrase('recording', title)]
+        if artist:
+            parts.append(_fts_phrase('artist', artist))
+        if album:
+            parts.append(_fts_phrase('release', album))
+        rows = self.conn.execute(
+            "SELECT recording_id, release_id FROM recording_fts WHERE recording_fts MATCH ? ORDER BY rank LIMIT ?",
+            (" AND ".join(parts), limit * 10),
+        ).fetchall()
+
+        # 按录音分组，保留相关度顺序
+        releases_by_recording = {}
+        for row in rows:
+            release_ids = releases_by_recording.setdefault(row['recording_id'], [])
+            if row['release_id'] not in release_ids:
+                release_ids.append(row['release_id'])
+        return list(releases_by_recording.items())[:limit]
+
+    def search_recordings(self, title, artist=None, album=None, limit=5):
+        """
+        全文检索录音，返回 recording-list。
+        带专辑/艺术家条件无结果时逐步放宽条件 (接近在线搜索的模糊行为)。
+        """
+        if not title:
+            return []
+        matches = self._match(title, artist, album, limit)
+        if not matches and album:
+            matches = self._match(title, artist, None, limit)
+        if not matches and artist:
+            matches = self._match(title, None, None, limit)
+
+        recordings = []
+        for recording_id, release_ids in matches:
+            rec = self.conn.execute("SELECT * FROM recordings WHERE id = ?", (recording_id,)).fetchone()
+            release_list = []
+            for release_id in release_ids:
+                rel = self.conn.execute("SELECT id, title, date FROM releases WHERE id = ?", (release_id,)).fetchone()
+                if rel:
+                    release_list.append({'id': rel['id'], 'title': rel['title'], 'date': rel['date']})
+            recordings.append({
+                'id': rec['id'],
+                'title': rec['title'],
+                'artist-credit': _credit(rec['artist_id'], rec['artist_name']),
+                'release-list': release_list,
+            })
+        return recordings
+
+    def get_release(self, release_id):
+        """返回发行详情 (含 medium-list / track-list)，不存在时返回 None。"""
+        rel = self.conn.execute("SELECT * FROM releases WHERE id = ?", (release_id,)).fetchone()
+        if not rel:
+            return None
+
+        medium_list = []
+        for medium in self.conn.execute(
+            "SELECT position, format FROM media WHERE release_id = ? ORDER BY position", (release_id,)
+        ):
+            track_list = []
+            for track in self.conn.execute(
+                "SELECT t.id, t.position, t.number, t.title, t.recording_id, r.title AS recording_title "
+                "FROM tracks t LEFT JOIN recordings r ON r.id = t.recording_id "
+                "WHERE t.release_id = ? AND t.medium_position = ? ORDER BY t.position",
+                (release_id, medium['position']),
+            ):
+                track_list.append({
+                    'id': track['id'],
+                    'position': str(track['position']),
+                    'number': track['number'],
+                    'title': track['title'],
+                    'recording': {'id': track['recording_id'], 'title': track['recording_title'] or track['title']},
+                })
+            medium_list.append({
+                'position': str(medium['position']),
+                'format': medium['format'],
+                'track-list': track_list,
+                'track-count': len(track_list),
+            })
+
+        return {
+            'id': rel['id'],
+            'title': rel['title'],
+            'date': rel['date'],
+            'artist-credit': _credit(rel['artist_id'], rel['artist_name']),
+            'medium-list': medium_list,
+        }
+
+# ================= 命令行 =================
+
+def main():
+    parser = argparse.ArgumentParser(description="导入 MusicBrainz 发行 JSON 转储到本地 SQLite 镜像")
+    parser.add_argument("dump_path", help="release.tar.xz 或按行存储的发行 JSON (.json/.jsonl/.gz/.xz)")
+    parser.add_argument("--db", default="musicbrainz.db", help="镜像数据库路径 (默认 musicbrainz.db)")
+    parser.add_argument("--artist", help="只导入发行艺术家名称包含该字符串的发行")
+    parser.add_argument("--limit", type=int, help="最多导入的发行数量")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.dump_path):
+        print(f"文件未找到: {args.dump_path}")
+        return
+
+    print(f"正在导入: {args.dump_path} -> {args.db}")
+    count = import_dump(args.dump_path, args.db, artist_filter=args.artist, limit=args.limit)
+    print(f"完成。共导入 {count} 个发行。")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import struct
+
+import pytest
+
+# 入口脚本以仓库根目录为工作目录运行 (from src... import)，测试保持一致
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _flac_block(block_type, data, last=False):
+    return bytes([block_type | (0x80 if last else 0)]) + len(data).to_bytes(3, 'big') + data
+
+def _flac_bytes(tags, picture_size=0):
+    # STREAMINFO: 4096 样本/块, 44100Hz, 双声道, 16 位, 总样本数 0
+    streaminfo = struct.pack('>HH', 4096, 4096) + b'\0' * 6
+    streaminfo += ((44100 << 44) | (1 << 41) | (15 << 36)).to_bytes(8, 'big') + b'\0' * 16
+
+    comments = struct.pack('<I', 3) + b'ven' + struct.pack('<I', len(tags))
+    for key, value in tags.items():
+        entry = f"{key}={value}".encode('utf-8')
+        comments += struct.pack('<I', len(entry)) + entry
+
+    blocks = _flac_block(0, streaminfo)
+    if picture_size:
+        # 结构合法的 PICTURE 块 (mutagen 会解析)，图像数据为 picture_size 个空字节
+        mime = b'image/jpeg'
+        picture = struct.pack('>II', 3, len(mime)) + mime + struct.pack('>IIIIII', 0, 0, 0, 0, 0, picture_size)
+        blocks += _flac_block(6, picture + b'\0' * picture_size)
+    blocks += _flac_block(4, comments, last=True)
+    return b'fLaC' + blocks
+
+@pytest.fixture
+def make_flac():
+    """在指定路径写入一个只含标签的最小 FLAC 文件。"""
+    def _make(path, picture_size=0, **tags):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_flac_bytes(tags, picture_size=picture_size))
+        return str(path)
+    return _make
+
+def _atom(kind, data):
+    return struct.pack('>I', 8 + len(data)) + kind + data
+
+def _m4a_bytes():
+    # mutagen 读取 MP4 需要 moov/trak/mdia 中的 mdhd 与音频 hdlr
+    mdhd = _atom(b'mdhd', b'\0' * 4 + struct.pack('>IIII', 0, 0, 44100, 0) + b'\0' * 4)
+    hdlr = _atom(b'hdlr', b'\0' * 8 + b'soun' + b'\0' * 13)
+    moov = _atom(b'moov', _atom(b'trak', _atom(b'mdia', mdhd + hdlr)))
+    return _atom(b'ftyp', b'M4A \0\0\0\0') + moov + _atom(b'mdat', b'')
+
+@pytest.fixture
+def make_m4a():
+    """
+    写入一个最小 M4A 文件，并按 write_tags 的方式写入标签：
+    MP4 原子名作为键，字符串值；lyricist 写入 ----:com.apple.iTunes:LYRICIST。
+    """
+    from mutagen.mp4 import MP4, MP4Cover
+
+    def _make(path, cover_size=0, lyricist=None, **atoms):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(_m4a_bytes())
+        audio = MP4(str(path))
+        for key, value in atoms.items():
+            audio[key] = value
+        if lyricist:
+            audio['----:com.apple.iTunes:LYRICIST'] = [lyricist.encode('utf-8')]
+        if cover_size:
+            audio['covr'] = [MP4Cover(b'\xff\xd8' + b'\0' * cover_size, imageformat=MP4Cover.FORMAT_JPEG)]
+        audio.save()
+        return str(path)
+    return _make
@@ -0,0 +1,18 @@
+from src.common.audio import AudioFileHandler
+
+def test_get_tags_reads_m4a_composer_and_lyricist(tmp_path, make_m4a):
+    # 与 write_tags 写入 M4A 的方式一致：©wrt 与自定义 LYRICIST 原子
+    path = make_m4a(tmp_path / 'a.m4a', lyricist='作词人', **{'\xa9nam': 'T', '\xa9wrt': '作曲人'})
+
+    tags = AudioFileHandler(path).get_tags()
+
+    assert tags['title'] == 'T'
+    assert tags['composer'] == '作曲人'
+    assert tags['lyricist'] == '作词人'
+
+def test_get_tags_reads_flac_credits(tmp_path, make_flac):
+    path = make_flac(tmp_path / 'a.flac', title='T', composer='C', lyricist='L', copyright='(P)')
+
+    tags = AudioFileHandler(path).get_tags()
+
+    assert (tags['composer'], tags['lyricist'], tags['copyright']) == ('C', 'L', '(P)')
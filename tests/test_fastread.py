@@ -0,0 +1,86 @@
+import os
+
+from mutagen.id3 import ID3, TIT2, TPE1, TALB, TCOM, TXXX, UFID, APIC
+
+from src.common.fastread import FIELDS, CountingFile, _read_tags_mutagen, read_tags_fast
+
+def _both(path):
+    with open(path, 'rb') as f:
+        full = _read_tags_mutagen(path, f)
+    return read_tags_fast(path), full
+
+def _write_mp3(path, frames, v2_version):
+    # 一帧 MPEG-1 Layer III (128kbps/44.1kHz)，使 mutagen 能识别为 MP3
+    frame = b'\xff\xfb\x90\x00' + b'\0' * 413
+    with open(path, 'wb') as f:
+        f.write(frame * 4)
+    tags = ID3()
+    for frame in frames:
+        tags.add(frame)
+    tags.save(str(path), v2_version=v2_version)
+    return str(path)
+
+def test_mp3_v23_utf16_txxx_matches_mutagen(tmp_path):
+    # 与 write_tags 相同：TXXX 使用 encoding=3，但 v2.3 保存时会转换为 UTF-16 (每个值各带 BOM)
+    path = _write_mp3(tmp_path / 'a.mp3', [
+        TIT2(encoding=3, text='富士山下'),
+        TPE1(encoding=3, text='陳奕迅'),
+        TALB(encoding=3, text="What's Going On...?"),
+        TCOM(encoding=3, text='Christopher Chak'),
+        TXXX(encoding=3, desc='MusicBrainz Album Id', text='f0e1-rel'),
+        TXXX(encoding=3, desc='MusicBrainz Artist Id', text='a1b2-art'),
+        UFID(owner='http://musicbrainz.org', data=b'rec-1'),
+        APIC(encoding=3, mime='image/jpeg', type=3, desc='', data=b'\xff\xd8' + b'\0' * 4096),
+    ], v2_version=3)
+
+    fast, full = _both(path)
+
+    assert fast is not None
+    assert fast['musicbrainz_albumid'] == 'f0e1-rel'
+    assert fast['musicbrainz_artistid'] == 'a1b2-art'
+    assert fast == full
+
+def test_mp3_v24_matches_mutagen(tmp_path):
+    path = _write_mp3(tmp_path / 'a.mp3', [
+        TIT2(encoding=3, text='T'),
+        TXXX(encoding=1, desc='MusicBrainz Album Id', text='rel-utf16'),
+    ], v2_version=4)
+
+    fast, full = _both(path)
+
+    assert fast is not None
+    assert fast['musicbrainz_albumid'] == 'rel-utf16'
+    assert fast == full
+
+def test_m4a_matches_mutagen(tmp_path, make_m4a):
+    path = make_m4a(tmp_path / 'a.m4a', cover_size=4096, lyricist='作词人', **{
+        '\xa9nam': 'T', '\xa9ART': 'A', '\xa9alb': 'B', 'aART': 'AA',
+        '\xa9wrt': '作曲人', 'cprt': '(P) 2006', 'trkn': [(2, 10)], 'disk': [(1, 2)],
+        '----:com.apple.iTunes:MusicBrainz Album Id': [b'rel-1'],
+    })
+
+    fast, full = _both(path)
+
+    assert fast is not None
+    assert (fast['composer'], fast['lyricist']) == ('作曲人', '作词人')
+    assert (fast['tracknumber'], fast['discnumber']) == ('2/10', '1/2')
+    assert fast == full
+
+def test_flac_skips_picture_and_matches_mutagen(tmp_path, make_flac):
+    path = make_flac(tmp_path / 'a.flac', picture_size=1 << 16, title='T', artist='A',
+                     composer='C', lyricist='L', musicbrainz_albumid='rel-1')
+
+    with open(path, 'rb') as raw:
+        f = CountingFile(raw)
+        fast = read_tags_fast(path, f)
+    _, full = _both(path)
+
+    assert fast == full
+    assert set(fast) == set(FIELDS)
+    # 封面块只跳过不读取
+    assert f.bytes_read < os.path.getsize(path) // 4
+
+def test_unsupported_file_returns_none(tmp_path):
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(b'not audio')
+    assert read_tags_fast(str(path)) is None
@@ -0,0 +1,69 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+pytest.importorskip("bs4")
+pytest.importorskip("selenium")
+
+from mutagen.flac import FLAC
+from mutagen.id3 import ID3, TRCK, TPOS
+from mutagen.mp4 import MP4
+
+from src.applemusic.finder import search_apple_music, write_tags
+from src.common import throttle
+
+def _meta(**extra):
+    meta = {'title': 'T', 'artist': 'A', 'album': 'B', 'composer': '', 'lyricist': '', 'copyright': ''}
+    meta.update(extra)
+    return meta
+
+def test_m4a_keeps_existing_totals(tmp_path, make_m4a):
+    path = make_m4a(tmp_path / 'a.m4a', trkn=[(3, 12)], disk=[(1, 2)])
+
+    assert write_tags(path, _meta(tracknumber='3', discnumber='1'))
+    audio = MP4(path)
+    assert (audio['trkn'], audio['disk']) == ([(3, 12)], [(1, 2)])
+
+    # 来源给出总数时以来源为准；非数字编号不写入
+    assert write_tags(path, _meta(tracknumber='4/10', discnumber='A'))
+    audio = MP4(path)
+    assert (audio['trkn'], audio['disk']) == ([(4, 10)], [(1, 2)])
+
+def test_flac_keeps_existing_totals(tmp_path, make_flac):
+    path = make_flac(tmp_path / 'a.flac', tracknumber='3/12', discnumber='1/2')
+
+    assert write_tags(path, _meta(tracknumber='3', discnumber='1'))
+    audio = FLAC(path)
+    assert (audio['tracknumber'], audio['discnumber']) == (['3/12'], ['1/2'])
+
+def test_mp3_keeps_existing_totals(tmp_path):
+    path = str(tmp_path / 'a.mp3')
+    with open(path, 'wb') as f:
+        f.write(b'\xff\xfb\x90\x00' + b'\0' * 413)
+    tags = ID3()
+    tags.add(TRCK(encoding=3, text='3/12'))
+    tags.add(TPOS(encoding=3, text='1/2'))
+    tags.save(path, v2_version=3)
+
+    assert write_tags(path, _meta(tracknumber='3', discnumber='2'))
+    tags = ID3(path)
+    assert (str(tags['TRCK']), str(tags['TPOS'])) == ('3/12', '2/2')
+
+class ThrottledSession:
+    """始终返回 429 的假 Session。"""
+    def __init__(self):
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        res = requests.Response()
+        res.status_code = 429
+        res.headers['Retry-After'] = '0'
+        res.url = url
+        return res
+
+def test_search_returns_none_when_throttled_after_retries():
+    session = ThrottledSession()
+
+    # 与 "没有结果" 的空列表区分，批量模式据此把文件标记为失败并重试
+    assert search_apple_music({'title': 'T', 'artist': 'A'}, session=session) is None
+    assert session.calls == throttle.MAX_RETRIES + 1
@@ -0,0 +1,63 @@
+import os
+
+from src.common.library import LibraryIndex
+
+def test_scan_is_incremental(tmp_path, make_flac):
+    make_flac(tmp_path / 'lib' / 'a.flac', title='A')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+
+    assert index.scan(str(tmp_path / 'lib'))['added'] == 1
+    stats = index.scan(str(tmp_path / 'lib'))
+    assert stats['added'] == 0 and stats['unchanged'] == 1
+
+    os.remove(tmp_path / 'lib' / 'a.flac')
+    assert index.scan(str(tmp_path / 'lib'))['removed'] == 1
+
+def test_query_missing_fields(tmp_path, make_flac):
+    make_flac(tmp_path / 'lib' / 'a.flac', title='A', composer='C', lyricist='L')
+    b = make_flac(tmp_path / 'lib' / 'b.flac', title='B', composer='C')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+    index.scan(str(tmp_path / 'lib'))
+
+    assert index.query(missing=['composer']) == []
+    assert index.query(missing=['composer', 'lyricist']) == [b]
+
+def test_unreadable_files_are_not_reported_as_missing(tmp_path, make_flac):
+    b = make_flac(tmp_path / 'lib' / 'b.flac', title='B')
+    broken = tmp_path / 'lib' / 'broken.mp3'
+    broken.write_bytes(b'not audio at all')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+
+    assert index.scan(str(tmp_path / 'lib'))['errors'] == 1
+    assert index.query(missing=['composer']) == [b]
+    assert index.query(errors=True) == [str(broken)]
+
+def test_query_mixed_album_ids(tmp_path, make_flac):
+    mixed = [
+        make_flac(tmp_path / 'lib' / 'x' / '1.flac', musicbrainz_albumid='r1'),
+        make_flac(tmp_path / 'lib' / 'x' / '2.flac', musicbrainz_albumid='r2'),
+    ]
+    make_flac(tmp_path / 'lib' / 'y' / '1.flac', musicbrainz_albumid='r3')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+    index.scan(str(tmp_path / 'lib'))
+
+    assert index.query(mixed_album_ids=True) == sorted(mixed)
+
+def test_directory_prefix_is_case_sensitive(tmp_path, make_flac):
+    upper = make_flac(tmp_path / 'lib' / 'Rock' / 'a.flac', title='A')
+    lower = make_flac(tmp_path / 'lib' / 'rock' / 'b.flac', title='B')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+
+    index.scan(str(tmp_path / 'lib' / 'Rock'))
+    assert index.scan(str(tmp_path / 'lib' / 'rock'))['removed'] == 0
+    assert index.scan(str(tmp_path / 'lib' / 'Rock'))['removed'] == 0
+    assert index.query(under=str(tmp_path / 'lib' / 'rock')) == [lower]
+    assert index.query(under=str(tmp_path / 'lib' / 'Rock')) == [upper]
+
+def test_like_wildcards_in_directory_names(tmp_path, make_flac):
+    make_flac(tmp_path / 'lib' / 'a_b' / '1.flac', title='1')
+    other = make_flac(tmp_path / 'lib' / 'axb' / '2.flac', title='2')
+    index = LibraryIndex(str(tmp_path / 'library.db'))
+    index.scan(str(tmp_path / 'lib'))
+
+    assert other not in index.query(under=str(tmp_path / 'lib' / 'a_b'))
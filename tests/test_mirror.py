@@ -0,0 +1,141 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+from src.musicbrainz.mirror import MusicBrainzMirror, import_dump
+
+DUMP = os.path.join(os.path.dirname(__file__), 'fixtures', 'mb_dump.jsonl')
+
+@pytest.fixture
+def mirror_db(tmp_path):
+    db_path = str(tmp_path / 'mb.db')
+    assert import_dump(DUMP, db_path) == 3
+    return db_path
+
+@pytest.fixture
+def mirror(mirror_db):
+    m = MusicBrainzMirror(mirror_db)
+    yield m
+    m.close()
+
+def _counts(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('releases', 'media', 'tracks', 'recordings', 'recording_fts')}
+    finally:
+        conn.close()
+
+def test_import_dump_counts(mirror_db):
+    # 没有录音的轨道 (Data Track) 不导入
+    assert _counts(mirror_db) == {'releases': 3, 'media': 4, 'tracks': 6, 'recordings': 5, 'recording_fts': 6}
+
+def test_reimport_replaces_rows(mirror_db):
+    assert import_dump(DUMP, mirror_db) == 3
+    assert _counts(mirror_db) == {'releases': 3, 'media': 4, 'tracks': 6, 'recordings': 5, 'recording_fts': 6}
+
+def test_import_dump_filter_and_limit(tmp_path):
+    db_path = str(tmp_path / 'joni.db')
+    assert import_dump(DUMP, db_path, artist_filter='joni') == 1
+    assert _counts(db_path)['tracks'] == 2
+
+    assert import_dump(DUMP, str(tmp_path / 'limit.db'), limit=2) == 2
+
+def test_import_dump_gz(tmp_path):
+    import gzip
+    gz_path = str(tmp_path / 'dump.jsonl.gz')
+    with open(DUMP, 'rb') as src, gzip.open(gz_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    assert import_dump(gz_path, str(tmp_path / 'gz.db')) == 3
+
+def test_search_recordings_shape(mirror):
+    results = mirror.search_recordings('Under Mount Fuji', artist='Eason Chan', album="What's Going On...?")
+    assert [r['id'] for r in results] == ['rec-fuji']
+    recording = results[0]
+    assert recording['title'] == 'Under Mount Fuji'
+    assert recording['artist-credit'] == [{'artist': {'id': 'art-eason', 'name': 'Eason Chan'}}]
+    assert recording['release-list'] == [
+        {'id': 'rel-1', 'title': "What's Going On...?", 'date': '2006-04-25'},
+    ]
+
+def test_search_recordings_lists_all_releases(mirror):
+    results = mirror.search_recordings('Under Mount Fuji')
+    assert len(results) == 1
+    assert sorted(r['id'] for r in results[0]['release-list']) == ['rel-1', 'rel-2']
+
+def test_search_recordings_relaxes_album_then_artist(mirror):
+    # 专辑不匹配：放宽为 标题 + 艺术家
+    results = mirror.search_recordings('Lonely Christmas', artist='Eason Chan', album='No Such Album')
+    assert [r['id'] for r in results] == ['rec-xmas']
+    assert [r['id'] for r in results[0]['release-list']] == ['rel-2']
+
+    # 艺术家也不匹配：只按标题
+    results = mirror.search_recordings('All I Want', artist='Someone Else', album='No Such Album')
+    assert [r['id'] for r in results] == ['rec-want']
+
+    assert mirror.search_recordings('No Such Song', artist='Eason Chan') == []
+    assert mirror.search_recordings('') == []
+
+def test_search_recordings_escapes_quotes(mirror):
+    assert mirror.search_recordings('Say "Hello"') == []
+
+def test_get_release_shape(mirror):
+    release = mirror.get_release('rel-2')
+    assert release['id'] == 'rel-2'
+    assert release['title'] == 'Greatest Hits'
+    assert release['artist-credit'] == [{'artist': {'id': 'art-eason', 'name': 'Eason Chan'}}]
+
+    media = release['medium-list']
+    assert [m['position'] for m in media] == ['1', '2']
+    assert [m['track-count'] for m in media] == [1, 1]
+    assert media[1]['format'] == 'CD'
+
+    track = media[1]['track-list'][0]
+    assert track == {
+        'id': 'trk-2-2',
+        'position': '1',
+        'number': '1',
+        'title': 'Lonely Christmas',
+        'recording': {'id': 'rec-xmas', 'title': 'Lonely Christmas'},
+    }
+
+def test_get_release_missing(mirror):
+    assert mirror.get_release('no-such-release') is None
+
+def test_mirror_requires_existing_db(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        MusicBrainzMirror(str(tmp_path / 'missing.db'))
+
+def test_mirror_rejects_other_sqlite_db(tmp_path):
+    # 例如误把曲库索引 library.db 当作镜像
+    db_path = str(tmp_path / 'library.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE files (path TEXT PRIMARY KEY)")
+    conn.close()
+
+    with pytest.raises(ValueError):
+        MusicBrainzMirror(db_path)
+
+def test_mirror_rejects_non_sqlite_file(tmp_path):
+    path = tmp_path / 'not-a-db.db'
+    path.write_bytes(b'this is not sqlite' * 100)
+
+    with pytest.raises(ValueError):
+        MusicBrainzMirror(str(path))
+
+def test_client_reports_mirror_errors(mirror_db, capsys):
+    pytest.importorskip("musicbrainzngs")
+    pytest.importorskip("requests")
+    from src.musicbrainz.client import MusicBrainzClient
+
+    client = MusicBrainzClient(backend='local', db_path=mirror_db)
+    client.mirror.conn.execute("DROP TABLE recording_fts")
+
+    # 与在线 API 分支一致：输出错误并返回空结果，而不是抛出 sqlite3 异常
+    assert client.search_recording('Under Mount Fuji') == []
+    client.mirror.conn.execute("DROP TABLE releases")
+    assert client.get_release_info('rel-1') is None
+    assert "查询本地镜像出错" in capsys.readouterr().out
+    client.close()
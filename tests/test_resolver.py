@@ -0,0 +1,56 @@
+import pytest
+
+pytest.importorskip("bs4")
+pytest.importorskip("selenium")
+
+from src.common.provider import MetadataProvider
+from src.combined.resolver import CombinedResolver
+
+class FakeProvider(MetadataProvider):
+    def __init__(self, name, remote):
+        self.name = name
+        self.remote = remote
+        self.pins = []
+
+    def resolve(self, local_meta, pin=None):
+        self.pins.append(pin)
+        return dict(self.remote)
+
+LOCAL = {'title': '富士山下', 'artist': '陳奕迅', 'album': ''}
+
+def test_provider_without_resolve_cannot_be_constructed():
+    class Incomplete(MetadataProvider):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_mismatched_musicbrainz_result_is_dropped():
+    mb = FakeProvider('musicbrainz', {'album': 'Another Album', 'artist': '陳奕迅',
+                                      'musicbrainz_albumid': 'rel-x', 'tracknumber': '9'})
+    apple = FakeProvider('applemusic', {'album': 'What\'s Going On...? - EP', 'artist': '陳奕迅'})
+    resolver = CombinedResolver([mb, apple])
+    try:
+        final, results = resolver.resolve(LOCAL)
+    finally:
+        resolver.close()
+
+    assert results['musicbrainz'] == {}
+    assert final['musicbrainz_albumid'] == ''
+    assert final['album'] == "What's Going On...? - EP"
+
+def test_matching_results_are_merged_and_pins_forwarded():
+    mb = FakeProvider('musicbrainz', {'album': "What's Going On...?", 'artist': 'Eason Chan',
+                                      'musicbrainz_albumid': 'rel-1', 'tracknumber': '3'})
+    apple = FakeProvider('applemusic', {'album': "What's Going On...? - EP", 'artist': '陳奕迅'})
+    resolver = CombinedResolver([mb, apple])
+    try:
+        # 艺术家名与 Apple 不同，但与本地标签一致时仍然接受
+        final, results = resolver.resolve(dict(LOCAL, artist='Eason Chan'),
+                                          pins={'musicbrainz': 'rel-1', 'applemusic': 42})
+    finally:
+        resolver.close()
+
+    assert mb.pins == ['rel-1'] and apple.pins == [42]
+    assert final['musicbrainz_albumid'] == 'rel-1'
+    assert final['tracknumber'] == '3'
@@ -0,0 +1,104 @@
+import time
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from src.common.throttle import AdaptiveLimiter, call_with_retry, get_limiter, parse_retry_after, request
+
+def test_sequential_calls_do_not_raise_limit():
+    limiter = AdaptiveLimiter('test', initial=2, max_limit=16)
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release()
+    # 串行调用从未用满上限，上限不应增长
+    assert limiter.snapshot()['limit'] == 2
+    assert limiter.snapshot()['ok'] == 50
+
+def test_limit_grows_only_when_binding():
+    limiter = AdaptiveLimiter('test', initial=2, max_limit=16)
+    for _ in range(10):
+        limiter.acquire()
+        limiter.acquire()
+        limiter.release()
+        limiter.release()
+    assert limiter.snapshot()['limit'] > 2
+
+def test_throttle_halves_limit():
+    limiter = AdaptiveLimiter('test', initial=8)
+    limiter.acquire()
+    limiter.release(throttled=True, retry_after=0)
+    assert limiter.snapshot()['limit'] == 4
+    assert limiter.snapshot()['throttled'] == 1
+
+def test_call_with_retry_zero_retries_calls_once():
+    limiter = AdaptiveLimiter('test', initial=1, max_limit=1)
+    calls = []
+
+    def func():
+        calls.append(1)
+        raise IOError("network")
+
+    with pytest.raises(IOError):
+        call_with_retry(limiter, func, lambda e: (True, 0), max_retries=0)
+    assert len(calls) == 1
+    assert limiter.snapshot()['retries'] == 0
+    assert limiter.snapshot()['throttled'] == 1
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+class FakeSession:
+    """按顺序返回预设的响应；元素为异常时抛出。"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        item = self.responses.pop(0)
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+def test_request_retries_throttled_response_after_retry_after():
+    session = FakeSession([FakeResponse(429, {'Retry-After': '1'}), FakeResponse(200)])
+
+    start = time.time()
+    res = request("GET", "https://retry-after.test/search", session=session)
+
+    assert res.status_code == 200
+    assert session.calls == 2
+    # 第二次请求等待了 Retry-After 指定的时间
+    assert time.time() - start >= 0.9
+    stats = get_limiter('retry-after.test').snapshot()
+    assert (stats['throttled'], stats['retries'], stats['ok'], stats['in_flight']) == (1, 1, 1, 0)
+
+def test_request_returns_throttled_response_when_retries_exhausted():
+    session = FakeSession([FakeResponse(403, {'Retry-After': '0'}) for _ in range(3)])
+
+    res = request("GET", "https://exhausted.test/search", session=session, max_retries=2)
+
+    assert res.status_code == 403
+    assert session.calls == 3
+    assert get_limiter('exhausted.test').snapshot()['in_flight'] == 0
+
+def test_request_releases_slot_on_unexpected_exception():
+    session = FakeSession([requests.exceptions.ChunkedEncodingError("boom") for _ in range(3)] + [FakeResponse(200)])
+
+    # 默认上限为 2：若异常没有归还并发槽，第三次调用会在 acquire() 中永久等待
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            request("GET", "https://unexpected.test/search", session=session)
+    assert request("GET", "https://unexpected.test/search", session=session).status_code == 200
+
+    stats = get_limiter('unexpected.test').snapshot()
+    assert (stats['in_flight'], stats['failed'], stats['throttled']) == (0, 3, 0)
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("bs4")
+pytest.importorskip("selenium")
+
+from src.applemusic import batch
+from src.applemusic.watch import MAX_ATTEMPTS, AlbumCollector
+
+def _write(path, data=b'audio'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return str(path)
+
+def test_album_released_after_settle(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a = _write(tmp_path / 'A' / '01.mp3')
+    collector.touch(a, now=0)
+
+    assert collector.pop_ready_albums(now=4.9) == []
+    assert collector.pop_ready_albums(now=5.0) == [(str(tmp_path / 'A'), [a])]
+
+def test_new_file_delays_whole_album(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a1 = _write(tmp_path / 'A' / '01.mp3')
+    a2 = _write(tmp_path / 'A' / '02.mp3')
+    b1 = _write(tmp_path / 'B' / '01.mp3')
+    collector.touch(a1, now=0)
+    collector.touch(b1, now=0)
+    collector.touch(a2, now=3)
+
+    # B 已稳定；A 中有新文件到达，整个目录继续等待
+    assert collector.pop_ready_albums(now=6) == [(str(tmp_path / 'B'), [b1])]
+    assert collector.pop_ready_albums(now=8) == [
+        (str(tmp_path / 'A'), [a1, a2]),
+        (str(tmp_path / 'B'), [b1]),
+    ]
+
+def test_changed_file_restarts_settle(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a = _write(tmp_path / 'A' / '01.mp3')
+    collector.touch(a, now=0)
+    _write(a, b'audio, still copying')
+    collector.refresh(now=4)
+
+    assert collector.pop_ready_albums(now=6) == []
+    assert len(collector.pop_ready_albums(now=9)) == 1
+
+def test_events_from_own_writes_are_ignored(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a = _write(tmp_path / 'A' / '01.mp3')
+    collector.touch(a, now=0)
+    collector.release([a])
+
+    # 处理中：写入标签产生的事件忽略
+    _write(a, b'audio + tags')
+    collector.touch(a, now=6)
+    assert collector.pending == {}
+
+    # 处理完成：文件未再变化时忽略，之后被修改则重新处理
+    collector.mark_done(a)
+    collector.touch(a, now=7)
+    assert collector.pending == {}
+    _write(a, b'audio replaced by user')
+    collector.touch(a, now=8)
+    assert a in collector.pending
+
+def test_deleted_file_is_dropped(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a = _write(tmp_path / 'A' / '01.mp3')
+    collector.touch(a, now=0)
+    os.remove(a)
+    collector.refresh(now=1)
+    assert collector.pending == {}
+
+def test_retry_gives_up_after_max_attempts(tmp_path):
+    collector = AlbumCollector(settle=5.0)
+    a = _write(tmp_path / 'A' / '01.mp3')
+    collector.touch(a, now=0)
+    collector.release([a])
+
+    for attempt in range(1, MAX_ATTEMPTS):
+        assert collector.retry(a, now=10 * attempt)
+        # 重新放回待定列表，并重新开始计时
+        assert collector.pending[a][2] == 10 * attempt
+        assert a not in collector.in_flight
+        collector.release([a])
+
+    assert not collector.retry(a, now=100)
+
+def test_process_files_keeps_known_album(tmp_path, monkeypatch):
+    path = _write(tmp_path / 'A' / '05.mp3')
+    results = [
+        {'collectionId': 1, 'trackName': 'Song', 'collectionName': 'Compilation', 'trackViewUrl': 'u1'},
+        {'collectionId': 2, 'trackName': 'Song', 'collectionName': 'Album', 'trackViewUrl': 'u2'},
+    ]
+    scraped = []
+    monkeypatch.setattr(batch, 'read_and_search',
+                        lambda p, session=None: ({'title': 'Song', 'artist': 'A', 'album': ''}, results))
+    monkeypatch.setattr(batch, 'scrape_web_details_selenium', lambda url, driver=None: scraped.append(url) or
+                        {'composers': [], 'lyricists': [], 'copyright': '', 'label': '', 'error': ''})
+    monkeypatch.setattr(batch, 'write_tags', lambda p, meta: True)
+
+    # 重试/后到的文件沿用该目录已确定的专辑，而不是全局搜索的第一个结果
+    collection_id, statuses = batch.process_files([path], driver=None, interactive=False, collection_id=2)
+    assert (collection_id, statuses[path], scraped) == (2, batch.STATUS_OK, ['u2'])
+
+    # 该专辑中没有匹配项时跳过
+    collection_id, statuses = batch.process_files([path], driver=None, interactive=False, collection_id=3)
+    assert (collection_id, statuses[path]) == (3, batch.STATUS_SKIPPED)